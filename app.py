@@ -1,15 +1,55 @@
 # app.py
 import os
-import sqlite3
+import io
+import atexit
+import csv
 import json
-import calendar
-from datetime import date, datetime, timedelta
-from flask import Flask, request, render_template_string, session, redirect, url_for, g
+import sqlite3
+import hashlib
+import gzip
+import threading
+import secrets
+from datetime import date, datetime, time, timedelta, timezone, MINYEAR, MAXYEAR
+from bisect import bisect_right
+from functools import lru_cache, wraps
+from itertools import islice
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import click
+from flask import (Flask, Blueprint, request, render_template, session, redirect, url_for, g, jsonify, abort,
+                   make_response, stream_with_context)
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from db import ConnectionPool, WriteQueue
+from foods import FoodIndex
+from metrics import Metrics
+from cache import UserCache, PageCache
+from forms import FormErrors, form_rows, json_rows, parse_amount, parse_day, parse_items
+from storage import Day, Storage, MemoryStorage, day_totals
 
 app = Flask(__name__)
-app.secret_key = "supersecretkey"
-DATABASE = "iron.db"
-
+# Sessions are signed with IRON_SECRET_KEY. Without it each process makes
+# up a key, which is fine for `python app.py`; create_app() insists on it.
+app.secret_key = os.environ.get("IRON_SECRET_KEY") or secrets.token_hex(32)
+# Browsers don't send the session cookie with cross-site POSTs (CSRF)
+app.config.update(SESSION_COOKIE_HTTPONLY=True, SESSION_COOKIE_SAMESITE="Lax")
+DATABASE = os.environ.get("IRON_DB", "iron.db")
+pool = ConnectionPool(DATABASE)
+
+# IRON_METRICS=1 records per-endpoint timings (see /stats/metrics);
+# IRON_SLOW_MS=N also logs requests slower than N ms. Both off by default.
+metrics = Metrics(enabled=os.environ.get("IRON_METRICS") == "1",
+                  slow_ms=float(os.environ["IRON_SLOW_MS"]) if os.environ.get("IRON_SLOW_MS") else None)
+metrics.install(app)
+
+# IRON_GROUP_COMMIT=1 hands day saves to one writer thread that commits
+# saves arriving together in a single transaction (see db.WriteQueue)
+write_queue = WriteQueue(pool) if os.environ.get("IRON_GROUP_COMMIT") == "1" else None
+if write_queue is not None:
+    atexit.register(write_queue.close)
+
+# Foods (iron mg per 100 g) a new database's catalog starts with
 IRON_DATA = {
     "Almonds": 3.7,
     "Beef": 2.7,
@@ -29,284 +69,651 @@ IRON_DATA = {
     "Apple": 0.1
 }
 
-USER_ID = 1
+# Sizes offered for the dashboard's "Recent Days" table (first is the default)
+RECENT_WINDOWS = (5, 7, 30, 90)
 
 # === DB ===
+# Connections are reused per thread (see db.ConnectionPool). get_db() is the
+# read-only side; anything that modifies data goes through write_db().
 def get_db():
-    db = getattr(g, '_database', None)
-    if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+    return metrics.connection(pool.reader())
+
+def read_snapshot():
+    """get_db() inside a read transaction: every query until the end of the
+    request sees the same committed state (rolled back by pool.release())."""
+    db = get_db()
+    if not db.in_transaction:
+        db.execute("BEGIN")
     return db
 
+@contextmanager
+def write_db():
+    with pool.writer() as conn:
+        yield metrics.connection(conn)
+
+def run_write(fn):
+    """fn(db) in a write transaction, through write_queue if group commit is on.
+
+    Returns once the transaction has committed.
+    """
+    if write_queue is None:
+        with write_db() as db:
+            return fn(db)
+    return write_queue.submit(fn).result()
+
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    pool.release()
+
+# === SCHEMA ===
+# Migrations run once each, in order. PRAGMA user_version stores how many
+# have already been applied to a database file, so init_db() is safe to run
+# against old files as well as fresh ones.
+MIGRATIONS = [
+    # 1: original table
+    '''
+    CREATE TABLE IF NOT EXISTS records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        record_date TEXT,
+        total_iron REAL,
+        percentage REAL,
+        items_json TEXT
+    );
+    ''',
+    # 2: one row per user and day (keep the latest duplicate), indexed
+    '''
+    DELETE FROM records WHERE id NOT IN (
+        SELECT MAX(id) FROM records GROUP BY user_id, record_date
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_records_user_date
+        ON records (user_id, record_date);
+    ''',
+    # 3: per-user data version, bumped on every write (drives ETags)
+    '''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        user_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    ''',
+    # 4: normalized day items. items_json stays only on rows that have not
+    # been moved over yet (see backfill_record_items)
+    '''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        iron_per_100g REAL  -- NULL: not in the catalog, only referenced by old items
+    );
+    CREATE TABLE IF NOT EXISTS record_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        record_id INTEGER NOT NULL REFERENCES records (id),
+        position INTEGER NOT NULL,
+        product_id INTEGER NOT NULL REFERENCES products (id),
+        grams REAL NOT NULL,
+        iron_mg REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_record_items_record ON record_items (record_id, position);
+    CREATE INDEX IF NOT EXISTS idx_record_items_product ON record_items (product_id);
+    ''',
+    # 5: accounts; the daily norm moves here from the session. Owners of
+    # pre-existing records get "user<id>" accounts without a password, which
+    # can't log in until `flask set-password` gives them one
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        password_hash TEXT,
+        norm REAL NOT NULL DEFAULT 15.0
+    );
+    INSERT OR IGNORE INTO users (id, username)
+        SELECT DISTINCT user_id, 'user' || user_id FROM records;
+    ''',
+    # 6: the norm becomes effective-dated; stored percentages are kept, the
+    # current norm applies from the beginning of time
+    '''
+    CREATE TABLE IF NOT EXISTS user_norms (
+        user_id INTEGER NOT NULL,
+        effective_from TEXT NOT NULL,
+        norm REAL NOT NULL,
+        PRIMARY KEY (user_id, effective_from)
+    ) WITHOUT ROWID;
+    INSERT OR IGNORE INTO user_norms (user_id, effective_from, norm)
+        SELECT id, '0001-01-01', norm FROM users;
+    ALTER TABLE users DROP COLUMN norm;
+    ''',
+    # 7: the products table is the food catalog; bumped on every change so
+    # each process knows when to rebuild its search index
+    '''
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0);
+    ''',
+    # 8: weekly (from Monday) and monthly summaries per user, kept up to
+    # date by refresh_rollups(); the daily level is records itself
+    '''
+    CREATE TABLE IF NOT EXISTS rollups (
+        user_id INTEGER NOT NULL,
+        period TEXT NOT NULL,
+        period_start TEXT NOT NULL,
+        days INTEGER NOT NULL,
+        total_iron REAL NOT NULL,
+        percentage_sum REAL NOT NULL,
+        days_over INTEGER NOT NULL,
+        PRIMARY KEY (user_id, period, period_start)
+    ) WITHOUT ROWID;
+    INSERT INTO rollups
+        SELECT user_id, 'week', date(record_date, '-' || ((strftime('%w', record_date) + 6) % 7) || ' days'),
+               COUNT(*), SUM(total_iron), SUM(percentage), SUM(percentage > 100)
+        FROM records GROUP BY 1, 3;
+    INSERT INTO rollups
+        SELECT user_id, 'month', strftime('%Y-%m-01', record_date),
+               COUNT(*), SUM(total_iron), SUM(percentage), SUM(percentage > 100)
+        FROM records GROUP BY 1, 3;
+    ''',
+    # 9: the rows backfill_record_items() has yet to move, so looking for
+    # them at startup doesn't scan every record once they're all moved
+    '''
+    CREATE INDEX IF NOT EXISTS idx_records_items_json ON records (id) WHERE items_json IS NOT NULL;
+    ''',
+]
+
+def migrate(db):
+    """Apply the pending MIGRATIONS, each in its own transaction.
+
+    user_version is read again after BEGIN IMMEDIATE has taken the write
+    lock, so processes starting together on a new file apply each script
+    once: the others wait, then find it done.
+    """
+    for number, script in enumerate(MIGRATIONS, start=1):
+        if db.execute("PRAGMA user_version").fetchone()[0] >= number:
+            continue
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if db.execute("PRAGMA user_version").fetchone()[0] < number:
+                for statement in sql_statements(script):
+                    db.execute(statement)
+                db.execute(f"PRAGMA user_version = {number}")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    return len(MIGRATIONS)
+
+def sql_statements(script):
+    """The statements of a script one by one (executescript() would commit first)."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ""
 
 def init_db():
-    with app.app_context():
+    with write_db() as db:
+        migrate(db)
+        if db.execute("SELECT 1 FROM products WHERE iron_per_100g IS NOT NULL LIMIT 1").fetchone() is None:
+            add_foods(db, IRON_DATA.items())
+    backfill_record_items()
+
+# Databases (by path) whose schema this process has brought up to date
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+@app.before_request
+def ensure_schema():
+    """init_db() once per process and database file.
+
+    Also runs as the first request hook, so an app a WSGI server loads
+    without create_app() still gets its schema before the first query.
+    """
+    if DATABASE in _schema_ready:
+        return
+    with _schema_lock:
+        if DATABASE not in _schema_ready:
+            init_db()
+            _schema_ready.add(DATABASE)
+
+def create_app():
+    """The app with its database ready; the entry point for WSGI servers
+    (`waitress-serve --call app:create_app`). Safe to call more than once."""
+    if not os.environ.get("IRON_SECRET_KEY"):
+        raise RuntimeError("set IRON_SECRET_KEY to a long random string; it signs the session cookies")
+    ensure_schema()
+    return app
+
+def backfill_record_items(batch_size=500):
+    """Move items_json rows into record_items, one short transaction per batch.
+
+    Safe to run while serving: load_items() still reads rows that have not
+    been moved yet.
+    """
+    moved = 0
+    while True:
+        with write_db() as db:
+            rows = db.execute(
+                "SELECT id, items_json FROM records WHERE items_json IS NOT NULL LIMIT ?", (batch_size,)
+            ).fetchall()
+            write_items(db, {row["id"]: json.loads(row["items_json"]) for row in rows})
+            db.executemany("UPDATE records SET items_json = NULL WHERE id = ?", [(row["id"],) for row in rows])
+        moved += len(rows)
+        if len(rows) < batch_size:
+            return moved
+
+def bump_data_version(db, user_id):
+    """Mark the user's data as changed; call inside the writing transaction."""
+    db.execute(
+        """
+        INSERT INTO data_versions (user_id, version, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            version = version + 1,
+            updated_at = excluded.updated_at
+        """,
+        (user_id, datetime.now(timezone.utc).replace(microsecond=0).isoformat())
+    )
+
+def data_version(db, user_id):
+    """(version, last modified) of the user's data; (0, None) if never written."""
+    row = db.execute("SELECT version, updated_at FROM data_versions WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        return 0, None
+    return row["version"], datetime.fromisoformat(row["updated_at"])
+
+def product_ids(db, names):
+    """Map product names to products.id, adding unknown names outside the catalog."""
+    names = set(names)
+    db.executemany("INSERT OR IGNORE INTO products (name) VALUES (?)", [(name,) for name in names])
+    rows = db.execute(
+        f"SELECT id, name FROM products WHERE name IN ({','.join('?' * len(names))})", tuple(names)
+    ).fetchall()
+    return {row["name"]: row["id"] for row in rows}
+
+def write_items(db, items_by_record):
+    """Replace the items of every record id in items_by_record."""
+    db.executemany("DELETE FROM record_items WHERE record_id = ?", [(record_id,) for record_id in items_by_record])
+    names = {item["product"] for items in items_by_record.values() for item in items}
+    if not names:
+        return
+    ids = product_ids(db, names)
+    db.executemany(
+        "INSERT INTO record_items (record_id, position, product_id, grams, iron_mg) VALUES (?, ?, ?, ?, ?)",
+        [(record_id, pos, ids[item["product"]], item["grams"], item["iron"])
+         for record_id, items in items_by_record.items() for pos, item in enumerate(items)]
+    )
+
+def load_items_many(db, records):
+    """{record id: [{"product", "grams", "iron"}]} for records in either storage format."""
+    result = {}
+    pending = []
+    for record in records:
+        if record["items_json"] is not None:
+            result[record["id"]] = json.loads(record["items_json"])
+        else:
+            result[record["id"]] = []
+            pending.append(record["id"])
+    if pending:
+        cur = db.execute(
+            f"""
+            SELECT i.record_id, p.name, i.grams, i.iron_mg FROM record_items i
+            JOIN products p ON p.id = i.product_id
+            WHERE i.record_id IN ({','.join('?' * len(pending))}) ORDER BY i.record_id, i.position
+            """,
+            pending
+        )
+        for record_id, name, grams, iron in cur.fetchall():
+            result[record_id].append({"product": name, "grams": grams, "iron": iron})
+    return result
+
+def load_items(db, record):
+    return load_items_many(db, [record])[record["id"]]
+
+# === FOOD CATALOG ===
+# Catalog foods are products rows with iron_per_100g set. Each process
+# keeps a FoodIndex of them and rebuilds it when catalog_version moves.
+_food_index = (None, None)
+
+def add_foods(db, rows):
+    """Add or update catalog foods from (name, iron_per_100g) pairs."""
+    db.executemany(
+        """
+        INSERT INTO products (name, iron_per_100g) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET iron_per_100g = excluded.iron_per_100g
+        """,
+        rows
+    )
+    db.execute("UPDATE catalog_version SET version = version + 1")
+
+def food_index():
+    """The current FoodIndex; the version check runs once per request."""
+    global _food_index
+    if "food_index" in g:
+        return g.food_index
+    db = get_db()
+    version = db.execute("SELECT version FROM catalog_version").fetchone()[0]
+    if _food_index[0] != version:
+        rows = db.execute("SELECT id, name, iron_per_100g FROM products WHERE iron_per_100g IS NOT NULL").fetchall()
+        _food_index = (version, FoodIndex(rows))
+    g.food_index = _food_index[1]
+    return g.food_index
+
+# === NORMS ===
+# A user's daily limit is a list of (effective_from, norm) entries; each
+# applies until the next one. records.percentage is kept in line with it.
+DEFAULT_NORM = 15.0
+NORM_EPOCH = "0001-01-01"
+
+def norm_on(db, user_id, record_date):
+    row = db.execute(
+        """
+        SELECT norm FROM user_norms WHERE user_id = ? AND effective_from <= ?
+        ORDER BY effective_from DESC LIMIT 1
+        """,
+        (user_id, record_date)
+    ).fetchone()
+    return row["norm"] if row else DEFAULT_NORM
+
+def norm_schedule(db, user_id):
+    """Lookup function record_date -> norm over all of the user's entries."""
+    rows = db.execute(
+        "SELECT effective_from, norm FROM user_norms WHERE user_id = ? ORDER BY effective_from", (user_id,)
+    ).fetchall()
+    starts = [row["effective_from"] for row in rows]
+    norms = [row["norm"] for row in rows]
+
+    def lookup(record_date):
+        pos = bisect_right(starts, record_date)
+        return norms[pos - 1] if pos else DEFAULT_NORM
+    return lookup
+
+def set_norm(db, user_id, from_date, norm):
+    """Use `norm` from from_date until the user's next change.
+
+    Only percentages of records in that span are recomputed (an index range
+    update), so the cost is O(affected days). Returns that span as
+    (from_date, end) with end exclusive or None, or None if nothing changed.
+    """
+    if norm_on(db, user_id, from_date) == norm:
+        return None
+    db.execute(
+        """
+        INSERT INTO user_norms (user_id, effective_from, norm) VALUES (?, ?, ?)
+        ON CONFLICT (user_id, effective_from) DO UPDATE SET norm = excluded.norm
+        """,
+        (user_id, from_date, norm)
+    )
+    end = db.execute(
+        "SELECT MIN(effective_from) FROM user_norms WHERE user_id = ? AND effective_from > ?", (user_id, from_date)
+    ).fetchone()[0]
+    query = "UPDATE records SET percentage = ROUND(total_iron / ? * 100, 2) WHERE user_id = ? AND record_date >= ?"
+    params = [norm, user_id, from_date]
+    if end is not None:
+        query += " AND record_date < ?"
+        params.append(end)
+    db.execute(query, params)
+    return from_date, end
+
+# === ROLLUPS ===
+# period -> (SQL expression for a record's bucket start, Python equivalent)
+ROLLUP_PERIODS = {
+    "week": ("date(record_date, '-' || ((strftime('%w', record_date) + 6) % 7) || ' days')",
+             lambda d: d - timedelta(days=d.weekday())),
+    "month": ("strftime('%Y-%m-01', record_date)",
+              lambda d: d.replace(day=1)),
+}
+
+def refresh_rollups(db, user_id, start_date, end_date=None):
+    """Rebuild the week and month rows covering start_date..end_date.
+
+    Call in the transaction that changed those records; end_date=None means
+    "to the end of the history". Only records of the touched buckets are read.
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date) if end_date else date.max
+    for period, (bucket_sql, bucket_start) in ROLLUP_PERIODS.items():
+        first = bucket_start(start).isoformat()
+        db.execute(
+            "DELETE FROM rollups WHERE user_id = ? AND period = ? AND period_start BETWEEN ? AND ?",
+            (user_id, period, first, end.isoformat())
+        )
+        after = next_bucket(period, end)
+        db.execute(
+            f"""
+            INSERT INTO rollups
+            SELECT user_id, ?, {bucket_sql} AS bucket,
+                   COUNT(*), SUM(total_iron), SUM(percentage), SUM(percentage > 100)
+            FROM records
+            WHERE user_id = ? AND record_date >= ? {"AND record_date < ?" if after else ""}
+            GROUP BY bucket
+            """,
+            (period, user_id, first) + ((after.isoformat(),) if after else ())
+        )
+
+def next_bucket(period, day):
+    """Start of the bucket after the one containing day, or None past date.max."""
+    start = ROLLUP_PERIODS[period][1](day)
+    try:
+        if period == "week":
+            return start + timedelta(days=7)
+        return (start + timedelta(days=31)).replace(day=1)
+    except OverflowError:
+        return None
+
+def save_days(db, user_id, days):
+    """Upsert many days of one user; days is [(record_date, total, perc, items)]."""
+    db.executemany(
+        """
+        INSERT INTO records (user_id, record_date, total_iron, percentage, items_json)
+        VALUES (?, ?, ?, ?, NULL)
+        ON CONFLICT (user_id, record_date) DO UPDATE SET
+            total_iron = excluded.total_iron,
+            percentage = excluded.percentage,
+            items_json = NULL
+        """,
+        [(user_id, record_date, total, perc) for record_date, total, perc, _ in days]
+    )
+    cur = db.execute(
+        f"SELECT id, record_date FROM records WHERE user_id = ? AND record_date IN ({','.join('?' * len(days))})",
+        (user_id, *(day[0] for day in days))
+    )
+    ids = {record_date: record_id for record_id, record_date in cur.fetchall()}
+    write_items(db, {ids[record_date]: items for record_date, _, _, items in days})
+
+def save_record(db, user_id, record_date, total, perc, items):
+    save_days(db, user_id, [(record_date, total, perc, items)])
+
+def get_day(db, user_id, record_date):
+    return db.execute(
+        "SELECT * FROM records WHERE user_id = ? AND record_date = ?", (user_id, record_date)
+    ).fetchone()
+
+def write_day(db, user_id, record_date, items, norm):
+    """Save one day as the edit form does: norm change, record, rollups.
+
+    Returns (total, percentage, changed), changed being the span of days
+    whose records changed as (first, end) with end exclusive or None (a new
+    norm applies to later days too). The caller bumps the data version.
+    """
+    total, perc = day_totals(items, norm)
+    changed = set_norm(db, user_id, record_date, norm)
+    save_record(db, user_id, record_date, total, perc, items)
+    refresh_rollups(db, user_id, *(changed or (record_date, record_date)))
+    return total, perc, changed or (record_date, next_day(record_date))
+
+def next_day(day):
+    """The day after day, or None (an open end) after 9999-12-31."""
+    if day == date.max.isoformat():
+        return None
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+def product_totals(db, user_id, start_date, end_date):
+    """Per-product grams, iron and number of days over a date range, largest iron first."""
+    return db.execute(
+        """
+        SELECT p.name AS product, SUM(i.grams) AS grams, SUM(i.iron_mg) AS iron_mg,
+               COUNT(DISTINCT r.id) AS days
+        FROM records r
+        JOIN record_items i ON i.record_id = r.id
+        JOIN products p ON p.id = i.product_id
+        WHERE r.user_id = ? AND r.record_date BETWEEN ? AND ?
+        GROUP BY p.id
+        ORDER BY iron_mg DESC
+        """,
+        (user_id, start_date, end_date)
+    ).fetchall()
+
+# === STORAGE ===
+# Pages and the API read and save days through `storage` (see storage.Storage).
+# Users, the food catalog and the SQL-only features (import/export, trends,
+# analytics) stay in SQLite. IRON_STORAGE=memory keeps days in process
+# memory instead: nothing is saved to disk, for benchmarks and tests.
+class SQLiteStorage(Storage):
+    """Days in the records tables, through the connection pool and run_write()."""
+
+    persistent = True
+
+    def snapshot(self):
+        read_snapshot()
+
+    def get_day(self, user_id, record_date, items=True):
         db = get_db()
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                record_date TEXT,
-                total_iron REAL,
-                percentage REAL,
-                items_json TEXT
-            )
-        ''')
-        db.commit()
-
-# === HTML TEMPLATE ===
-HTML_TEMPLATE = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <!-- ✅ КЛЮЧЕВОЕ: корректный mobile viewport -->
-    <meta name="viewport" content="width=device-width, initial-scale=1, viewport-fit=cover">
-    <title>Iron Tracker</title>
-    <style>
-        :root {
-            --radius: 12px;
-            --shadow: 0 4px 12px rgba(0,0,0,0.06);
-        }
-
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
-            background-color: #f9f9f9;
-            padding: 16px;
-            color: #333;
-            display: flex;
-            justify-content: center;
-        }
-
-        .container {
-            width: 100%;
-            max-width: 820px;
-        }
-
-        h1 {
-            font-size: 28px;
-            margin: 0 0 8px;
-            text-align: center;
-        }
-
-        .date-indicator {
-            font-size: 15px;
-            color: #666;
-            text-align: center;
-            margin-bottom: 16px;
-        }
-
-        form {
-            background: #fff;
-            padding: 20px;
-            border-radius: var(--radius);
-            box-shadow: var(--shadow);
-            width: 100%;
-            box-sizing: border-box;
-        }
-
-        label, p {
-            font-weight: 600;
-            margin-bottom: 8px;
-            display: block;
-        }
-
-        /* поля */
-        select, input[type="number"], input[readonly] {
-            padding: 10px 12px;
-            border-radius: 10px;
-            border: 1px solid #d9d9d9;
-            font-size: 16px;
-            line-height: 1.2;
-        }
-
-        input[readonly] {
-            background: #f3f3f4;
-            border-color: #e6e6e7;
-            min-width: 90px;   /* не жёсткая ширина, чтобы на мобиле могло растягиваться */
-            width: auto;
-            text-align: center;
-        }
-
-        /* строка продукта — на десктопе выстраиваем в линию,
-           на мобиле превращаем в колонку */
-        #products > .product-row {
-            display: flex;
-            flex-wrap: wrap;
-            align-items: center;
-            gap: 10px;
-            margin-bottom: 10px;
-        }
-
-        /* базовое распределение ширин на широком экране */
-        #products .product-row select { flex: 1 1 240px; }
-        #products .product-row input[type="number"] { flex: 1 1 180px; }
-        #products .product-row input[readonly] { flex: 0 0 110px; }
-
-        .remove-button {
-            background: none;
-            border: none;
-            color: #888;
-            font-size: 14px;
-            cursor: pointer;
-            padding: 6px 8px;
-            transition: color 0.2s;
-        }
-        .remove-button:hover { color: #ff3b30; }
-
-        button, input[type="submit"] {
-            background-color: #007aff;
-            color: white;
-            border: none;
-            padding: 12px 16px;
-            border-radius: 10px;
-            font-size: 16px;
-            cursor: pointer;
-            margin-top: 8px;
-        }
-        button:hover, input[type="submit"]:hover { background-color: #005ecb; }
-
-        .calendar-link {
-            display: inline-block;
-            margin-top: 22px;
-            background-color: #e5e5ea;
-            color: #333;
-            padding: 10px 16px;
-            border-radius: 10px;
-            text-decoration: none;
-            font-weight: 600;
-            text-align: center;
-        }
-        .calendar-link:hover { background-color: #d1d1d6; }
-
-        .result-ok, .result-over {
-            text-align: center;
-            font-weight: 700;
-        }
-        .result-ok  { color: #34c759; }
-        .result-over{ color: #ff3b30; }
-
-        .calendar-container { text-align: center; }
-
-        /* 📱 мобильная адаптация */
-        @media (max-width: 640px) {
-            body { padding: 12px; }
-            h1 { font-size: 22px; }
-
-            form { padding: 14px; }
-
-            #products > .product-row {
-                flex-direction: column;
-                align-items: stretch;
-                gap: 8px;
-            }
-
-            /* каждая колонка растягивается на всю ширину */
-            #products .product-row select,
-            #products .product-row input[type="number"],
-            #products .product-row input[readonly] {
-                flex: 1 1 100%;
-                width: 100%;
-            }
-
-            /* кнопки во всю ширину — удобные для тапа */
-            button, input[type="submit"], .calendar-link {
-                width: 100%;
-            }
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>Iron Tracker</h1>
-        <div class="date-indicator">📅 {{ day_text[5:] }}</div>
-
-        <form method="post">
-            <label><strong>Please specify your maximum daily iron intake (mg):</strong></label>
-            <input type="number" step="0.1" name="norm" value="{{ norm }}" required>
-
-            <p><strong>Enter the products you consumed{{ day_text }}:</strong></p>
-            <div id="products">
-                {% for i in range(product_count) %}
-                <div class="product-row" data-index="{{ i }}">
-                    <select name="product_{{ i }}">
-                        {% for name in iron_data %}
-                            <option value="{{ name }}" {% if selections[i]['product'] == name %}selected{% endif %}>{{ name }}</option>
-                        {% endfor %}
-                    </select>
-                    <input type="number" name="grams_{{ i }}" placeholder="Grams" value="{{ selections[i]['grams'] }}" required>
-                    <input type="text" readonly value="{{ selections[i]['iron'] }} mg">
-                    <button type="button" class="remove-button" onclick="removeProduct(this)">🗑 Delete</button>
-                </div>
-                {% endfor %}
-            </div>
-
-            <button type="button" onclick="addProduct()">➕ Add more</button>
-            <br>
-            <input type="submit" value="💾 Save">
-        </form>
-
-        {% if total is not none %}
-            <h3 class="{{ 'result-over' if total > norm else 'result-ok' }}">
-                Total: {{ "%.2f"|format(total) }} mg of iron
-            </h3>
-            <h4 class="{{ 'result-over' if total > norm else 'result-ok' }}">
-                {{ status }}
-            </h4>
-        {% endif %}
-
-        <div class="calendar-container">
-            <a href="/calendar" class="calendar-link">📆 Back to Calendar</a>
-        </div>
-    </div>
-
-    <script>
-        let count = {{ product_count }};
-        const ironData = {{ iron_data_json | safe }};
-
-        function addProduct() {
-            const div = document.createElement("div");
-            div.className = "product-row";
-            div.setAttribute("data-index", count);
-            div.innerHTML = `
-                <select name="product_${count}">
-                    ${Object.entries(ironData).map(([k]) => `<option value="${k}">${k}</option>`).join("")}
-                </select>
-                <input type="number" name="grams_${count}" placeholder="Grams" required>
-                <input type="text" readonly value=" mg">
-                <button type="button" class="remove-button" onclick="removeProduct(this)">🗑 Delete</button>
-            `;
-            document.getElementById("products").appendChild(div);
-            count++;
-        }
-
-        function removeProduct(button) {
-            const row = button.closest(".product-row");
-            row.remove();
-            updateIndexes();
-        }
-
-        function updateIndexes() {
-            const rows = document.querySelectorAll("#products .product-row");
-            rows.forEach((row, idx) => {
-                row.setAttribute("data-index", idx);
-                const selects = row.getElementsByTagName("select");
-                const inputs = row.getElementsByTagName("input");
-                if (selects.length > 0) selects[0].setAttribute("name", `product_${idx}`);
-                if (inputs.length > 0) inputs[0].setAttribute("name", `grams_${idx}`);
-            });
-            count = rows.length;
-        }
-    </script>
-</body>
-</html>
-'''
+        record = get_day(db, user_id, record_date)
+        if record is None:
+            return None
+        return Day(record["record_date"], record["total_iron"], record["percentage"],
+                   load_items(db, record) if items else None)
+
+    def get_range(self, user_id, start, end, items=False):
+        db = get_db()
+        columns = "id, record_date, total_iron, percentage, items_json" if items else "record_date, total_iron, percentage"
+        records = db.execute(
+            f"SELECT {columns} FROM records WHERE user_id = ? AND record_date BETWEEN ? AND ? ORDER BY record_date",
+            (user_id, start, end)
+        ).fetchall()
+        loaded = load_items_many(db, records) if items else {}
+        return [Day(r["record_date"], r["total_iron"], r["percentage"], loaded[r["id"]] if items else None)
+                for r in records]
+
+    def put_days(self, user_id, days):
+        def save(db):
+            results = [write_day(db, user_id, record_date, items, norm) for record_date, items, norm in days]
+            bump_data_version(db, user_id)
+            return results
+        return run_write(save)
+
+    def norm_on(self, user_id, record_date):
+        return norm_on(get_db(), user_id, record_date)
+
+    def version(self, user_id):
+        return data_version(get_db(), user_id)
+
+storage = MemoryStorage(DEFAULT_NORM) if os.environ.get("IRON_STORAGE") == "memory" else SQLiteStorage()
+
+def needs_sqlite(view):
+    """For views that query the records tables themselves: 501 with other storage."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not isinstance(storage, SQLiteStorage):
+            abort(501)
+        return view(*args, **kwargs)
+    return wrapper
+
+# === USERS ===
+# Every page except these needs a logged-in user; g.user is the users row.
+PUBLIC_ENDPOINTS = {"login", "register", "static"}
+
+@app.before_request
+def load_user():
+    user_id = session.get("user_id")
+    g.user = None
+    if user_id is not None:
+        g.user = get_db().execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    if g.user is None and request.endpoint not in PUBLIC_ENDPOINTS:
+        if request.blueprint == "api":
+            return jsonify(error="login required"), 401
+        return redirect(url_for("login", next=request.full_path if request.args else request.path))
+
+def create_user(db, username, password, norm=DEFAULT_NORM):
+    user_id = db.execute(
+        "INSERT INTO users (username, password_hash) VALUES (?, ?) RETURNING id",
+        (username, generate_password_hash(password) if password else None)
+    ).fetchone()[0]
+    db.execute("INSERT INTO user_norms (user_id, effective_from, norm) VALUES (?, ?, ?)", (user_id, NORM_EPOCH, norm))
+    return user_id
+
+def safe_next(target):
+    """target if it is a path on this site, else the dashboard."""
+    if (not target or not target.startswith("/") or "\\" in target
+            or any(ord(c) < 32 or ord(c) == 127 for c in target)):
+        return url_for("dashboard")
+    parts = urlsplit(target)
+    return url_for("dashboard") if parts.scheme or parts.netloc else target
+
+@app.before_request
+def check_origin():
+    """Refuse POSTs from other sites' pages (CSRF); browsers send Origin with them."""
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        return
+    origin = request.headers.get("Origin")
+    if origin is not None and urlsplit(origin).netloc != request.host:
+        abort(403)
+
+@app.route("/login", methods=["GET", "POST"])
+def login():
+    error = None
+    if request.method == "POST":
+        username = request.form["username"].strip()
+        password = request.form["password"]
+        user = get_db().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        # Accounts from before logins existed have no password until one is
+        # set with `flask set-password`; they can't be claimed from here
+        if (user is None or not password or user["password_hash"] is None
+                or not check_password_hash(user["password_hash"], password)):
+            error = "Wrong username or password."
+        if error is None:
+            session.clear()
+            session["user_id"] = user["id"]
+            return redirect(safe_next(request.args.get("next")))
+    return render_template("login.html", mode="login", error=error)
+
+@app.route("/register", methods=["GET", "POST"])
+def register():
+    error = None
+    if request.method == "POST":
+        username = request.form["username"].strip()
+        password = request.form["password"]
+        if not username or not password:
+            error = "Username and password are required."
+        else:
+            try:
+                with write_db() as wdb:
+                    user_id = create_user(wdb, username, password)
+            except sqlite3.IntegrityError:
+                error = "This username is already taken."
+            else:
+                session.clear()
+                session["user_id"] = user_id
+                return redirect(url_for("dashboard"))
+    return render_template("login.html", mode="register", error=error)
+
+@app.route("/logout", methods=["POST"])
+def logout():
+    session.clear()
+    return redirect(url_for("login"))
+
+@app.cli.command("set-password")
+@click.argument("username")
+@click.password_option()
+def set_password(username, password):
+    """Set a user's password, e.g. for a pre-login "user<id>" account."""
+    ensure_schema()
+    with write_db() as wdb:
+        updated = wdb.execute("UPDATE users SET password_hash = ? WHERE username = ?",
+                              (generate_password_hash(password), username)).rowcount
+    if not updated:
+        raise click.ClickException(f"no user {username!r}")
+    click.echo(f"Password set for {username}.")
 
 # === ROUTES ===
 
@@ -315,447 +722,868 @@ def edit_day(day):
     return handle_day(day)
 
 def handle_day(day):
-    db = get_db()
-    norm = session.get("norm", 15.0)
-    selections = []
-    total = None
-    status = None
-    record_date = day
-
-    cur = db.execute("SELECT * FROM records WHERE user_id = ? AND record_date = ?", (USER_ID, record_date))
-    record = cur.fetchone()
+    storage.snapshot()
+    user_id = g.user["id"]
+    try:
+        record_date = date.fromisoformat(day).isoformat()
+    except ValueError:
+        abort(404)
 
     if request.method == "POST":
-        norm = float(request.form["norm"])
-        session["norm"] = norm
+        norm = storage.norm_on(user_id, record_date)
+        # Форма (product/grams или product_N/grams_N) или JSON {"items", "norm"?}
+        if request.is_json:
+            body = request.get_json(silent=True)
+            if not isinstance(body, dict):
+                return jsonify(error="expected a JSON object"), 400
+            submitted_norm, rows = body.get("norm", norm), None
+        else:
+            submitted_norm, rows = request.form.get("norm"), form_rows(request.form)
+        try:
+            norm, selections = parse_day(submitted_norm, rows if rows is not None else json_rows(body.get("items")),
+                                         food_index())
+        except FormErrors as e:
+            if request.is_json:
+                return jsonify(error=str(e), errors=e.errors), 400
+            selections = [{"product": product or "", "grams": grams or "", "iron": ""}
+                          for _, product, grams in rows] or [{"product": "", "grams": "", "iron": ""}]
+            return render_template("edit.html",
+                                   product_count=len(selections),
+                                   selections=selections,
+                                   total=None,
+                                   status=None,
+                                   errors=e.errors,
+                                   norm=submitted_norm,
+                                   day_text=f" for {record_date}"), 400
+
+        total, perc, changed = storage.put_day(user_id, record_date, selections, norm)
+        records_changed(user_id, *changed)
+        if request.is_json:
+            return jsonify(date=record_date, total_iron=total, percentage=perc, items=len(selections))
+        return redirect(url_for("dashboard", saved=1))
 
-        selections = []
-        total = 0
-        i = 0
-        while True:
-            p_key = f"product_{i}"
-            g_key = f"grams_{i}"
-            if p_key in request.form and g_key in request.form:
-                name = request.form[p_key]
-                grams = float(request.form[g_key])
-                iron = round((IRON_DATA.get(name, 0) / 100) * grams, 2)
-                selections.append({"product": name, "grams": round(grams, 2), "iron": iron})
-                total += iron
-                i += 1
-            else:
-                break
+    version, updated_at = storage.version(user_id)
 
-        total = round(total, 2)
-        perc = round((total / norm) * 100, 2)
-        db.execute("DELETE FROM records WHERE user_id = ? AND record_date = ?", (USER_ID, record_date))
-        db.execute("INSERT INTO records (user_id, record_date, total_iron, percentage, items_json) VALUES (?, ?, ?, ?, ?)",
-                   (USER_ID, record_date, total, perc, json.dumps(selections, ensure_ascii=False)))
-        db.commit()
-        status = f"This is {perc}% of your daily limit."
-        return redirect(url_for("dashboard", saved=1))
-        
-    else:
+    def render():
+        record = storage.get_day(user_id, record_date)
+        total = None
+        status = None
         if record:
-            selections = json.loads(record["items_json"])
-            total = round(record["total_iron"], 2)
-            perc = round(record["percentage"], 2)
+            selections = record.items
+            total = round(record.total_iron, 2)
+            perc = round(record.percentage, 2)
             status = f"This is {perc}% of your daily limit."
         else:
             selections = [{"product": "", "grams": "", "iron": ""}]
 
-    return render_template_string(HTML_TEMPLATE,
-                                  iron_data=sorted(IRON_DATA.keys()),
-                                  iron_data_json=json.dumps(IRON_DATA, ensure_ascii=False),
-                                  product_count=len(selections),
-                                  selections=selections,
-                                  total=total,
-                                  status=status,
-                                  norm=norm,
-                                  day_text=f" for {record_date}")
-
-@app.route("/calendar")
-def calendar_view():
-    db = get_db()
-    today = date.today()
-    year = int(request.args.get("year", today.year))
-    month = int(request.args.get("month", today.month))
+        return render_template("edit.html",
+                               product_count=len(selections),
+                               selections=selections,
+                               total=total,
+                               status=status,
+                               norm=storage.norm_on(user_id, record_date),
+                               day_text=f" for {record_date}")
+
+    return conditional_page(("edit", user_id, version, record_date), updated_at, render)
+
+# === HTTP CACHING ===
+# Pages are private and always revalidated; the ETag is derived from the
+# page key (route, params, user data version), so a conditional GET for
+# unchanged data is answered with 304 before anything is rendered.
+STARTED_AT = datetime.now(timezone.utc).replace(microsecond=0)
+
+# Rendered bodies of those pages, under the same key plus build_id() and
+# the database. IRON_PAGE_CACHE_SIZE entries and IRON_PAGE_CACHE_MB of
+# bodies in memory (0: off; bodies over 1 MB aren't cached); IRON_PAGE_CACHE_DB
+# also keeps them in that SQLite file across restarts.
+page_cache = PageCache(max_entries=int(os.environ.get("IRON_PAGE_CACHE_SIZE", "512")),
+                       max_bytes=int(os.environ.get("IRON_PAGE_CACHE_MB", "64")) << 20,
+                       path=os.environ.get("IRON_PAGE_CACHE_DB"))
+
+@lru_cache(maxsize=None)
+def build_id():
+    """Hash of the code, templates and static files, so no build serves another's pages.
+
+    Worked out on the first page render, not at import.
+    """
+    digest = hashlib.sha1()
+    paths = [os.path.join(app.root_path, name) for name in os.listdir(app.root_path) if name.endswith(".py")]
+    for folder in (app.template_folder, app.static_folder):
+        for root, _, files in os.walk(os.path.join(app.root_path, folder)):
+            paths.extend(os.path.join(root, name) for name in files)
+    for path in sorted(paths):
+        with open(path, "rb") as f:
+            digest.update(path.encode() + f.read())
+    return digest.hexdigest()
+
+def conditional_page(key, last_modified, render):
+    etag = hashlib.sha1(repr((STARTED_AT, key)).encode()).hexdigest()
+    last_modified = max(filter(None, (last_modified, STARTED_AT)))
+
+    if request.if_none_match:
+        # weak: compress_response() weakens the ETag of compressed pages
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        fresh = request.if_modified_since is not None and last_modified <= request.if_modified_since
 
-    _, days_in_month = calendar.monthrange(year, month)
+    if fresh:
+        response = app.response_class(status=304)
+    else:
+        # IRON_PAGE_CACHE_DB may be shared by apps on different databases; days
+        # kept in memory start over with the process, and so do their versions
+        scope = (build_id(), os.path.abspath(DATABASE))
+        if not storage.persistent:
+            scope += (STARTED_AT,)
+        cache_key = hashlib.sha1(repr((scope, key)).encode()).hexdigest()
+        cached = page_cache.get(cache_key)
+        if cached is not None:
+            response = app.response_class(cached[0], mimetype=cached[1])
+        else:
+            response = make_response(render())
+            if response.status_code == 200 and not response.is_streamed:
+                page_cache.put(cache_key, g.user["id"], response.get_data(), response.mimetype)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# === STATIC FILES & COMPRESSION ===
+# CSS/JS live in static/ and are linked with a content hash (static_url), so
+# browsers may keep them forever: a changed file gets a new URL. Text
+# responses are compressed with brotli (if installed) or gzip.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = {"text/html", "text/css", "text/csv", "application/javascript", "text/javascript",
+                "application/json"}
+COMPRESS_MIN_BYTES = 500
+# (filename, encoding) -> (version, compressed body): one entry per file and encoding
+_compressed_static = {}
+
+@lru_cache(maxsize=None)
+def static_version(filename):
+    with app.open_resource(os.path.join(app.static_folder, filename)) as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+@app.template_global()
+def static_url(filename):
+    return url_for("static", filename=filename, v=static_version(filename))
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+@app.after_request
+def compress_response(response):
+    # only the current hash pins the content; any other ?v= is an ordinary request
+    filename = request.endpoint == "static" and response.status_code == 200 and request.view_args["filename"]
+    fingerprinted = filename and request.args.get("v") == static_version(filename)
+    if fingerprinted:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+
+    if (response.status_code != 200 or response.is_streamed and not response.direct_passthrough
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    accepted = request.accept_encodings
+    encoding = "br" if brotli and accepted["br"] else "gzip" if accepted["gzip"] else None
+    response.vary.add("Accept-Encoding")
+    if encoding is None:
+        return response
+
+    response.direct_passthrough = False
+    if fingerprinted:
+        # the URL pins the content, so compress each file once
+        version, body = _compressed_static.get((filename, encoding), (None, None))
+        if version != request.args["v"]:
+            body = compress(response.get_data(), encoding)
+            _compressed_static[filename, encoding] = (request.args["v"], body)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        body = compress(data, encoding)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# === CALENDAR ===
+@lru_cache(maxsize=120)
+def month_grid(year, month):
+    """Fixed 6x7 layout (Monday first) of the weeks around a month.
+
+    Cells are (iso date, day of month, in this month). The layout never
+    changes, so it is built once per (year, month); only the percentages
+    from the DB are laid over it per request.
+    """
     first_day = date(year, month, 1)
     start_day = first_day - timedelta(days=first_day.weekday())
-    end_day = date(year, month, days_in_month)
+    cells = []
+    for offset in range(6 * 7):
+        day = start_day + timedelta(days=offset)
+        cells.append((day.isoformat(), day.day, day.month == month))
+    return tuple(tuple(cells[i:i + 7]) for i in range(0, len(cells), 7))
 
-    cur = db.execute(
-        "SELECT record_date, percentage FROM records WHERE user_id = ? AND record_date BETWEEN ? AND ?",
-        (USER_ID, start_day.isoformat(), (end_day + timedelta(days=6 - end_day.weekday())).isoformat())
-    )
-    data = {row["record_date"]: row["percentage"] for row in cur.fetchall()}
-
-    html = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <title>Calendar — {year}-{month:02}</title>
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <style>
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
-                background-color: #f9f9f9;
-                color: #333;
-                padding: 40px;
-                display: flex;
-                justify-content: center;
-            }}
-            .calendar-container {{
-                background: #fff;
-                border-radius: 14px;
-                box-shadow: 0 4px 14px rgba(0,0,0,0.08);
-                padding: 30px;
-                max-width: 850px;
-                width: 100%;
-            }}
-            h1 {{
-                font-size: 26px;
-                text-align: center;
-                margin-bottom: 25px;
-            }}
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                text-align: center;
-                border-radius: 10px;
-                overflow: hidden;
-                table-layout: fixed; /* фиксированные размеры колонок */
-            }}
-            th {{
-                background-color: #f0f0f0;
-                font-weight: 600;
-                padding: 12px 0;
-                font-size: 15px;
-            }}
-            td {{
-                width: 14.28%;
-                height: 80px;
-                border: 1px solid #eee;
-                font-size: 16px;
-                vertical-align: middle;
-                position: relative;
-            }}
-            td a {{
-                text-decoration: none;
-                color: #333;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                height: 100%;
-                width: 100%;
-                transition: background-color 0.2s;
-            }}
-            td a:hover {{
-                background-color: #eaf4ff;
-            }}
-            .green-day {{ background-color: #d4edda; }}
-            .red-day {{ background-color: #f8d7da; }}
-            .gray-day {{ background-color: #f1f1f1; color: #aaa; }}
-            .empty-day {{ background-color: #fff; }}
-
-            .nav-controls {{
-                display: flex;
-                justify-content: center;
-                gap: 20px;
-                margin: 25px 0;
-            }}
-            .nav-btn {{
-                background-color: #e5e5ea;
-                color: #333;
-                padding: 10px 16px;
-                border-radius: 8px;
-                text-decoration: none;
-                font-weight: 500;
-                transition: background-color 0.2s;
-            }}
-            .nav-btn:hover {{ background-color: #d1d1d6; }}
-
-            .home-btn {{
-                display: block;
-                width: fit-content;
-                margin: 0 auto;
-                background-color: #007aff;
-                color: white;
-                padding: 10px 16px;
-                border-radius: 8px;
-                text-decoration: none;
-                font-weight: 500;
-                transition: background-color 0.2s;
-            }}
-            .home-btn:hover {{ background-color: #005ecb; }}
-        </style>
-    </head>
-    <body>
-        <div class="calendar-container">
-            <h1>📅 Calendar — {year}-{month:02}</h1>
-            <table>
-                <tr>
-                    <th>Mon</th><th>Tue</th><th>Wed</th>
-                    <th>Thu</th><th>Fri</th><th>Sat</th><th>Sun</th>
-                </tr>
-    """
-
-    current = start_day
-    while True:
-        html += "<tr>"
-        for _ in range(7):
-            day_str = current.isoformat()
-            percentage = data.get(day_str)
-
-            if percentage is None and current.month != month:
-                class_name = "gray-day"
-                cell = f"<td class='{class_name}'>{current.day}</td>"
-            elif percentage is None:
-                class_name = "empty-day"
-                cell = f"<td class='{class_name}'><a href='/edit/{day_str}'>{current.day}</a></td>"
-            elif percentage > 100:
-                class_name = "red-day"
-                cell = f"<td class='{class_name}'><a href='/edit/{day_str}'>{current.day}</a></td>"
-            else:
-                class_name = "green-day"
-                cell = f"<td class='{class_name}'><a href='/edit/{day_str}'>{current.day}</a></td>"
-
-            html += cell
-            current += timedelta(days=1)
-        html += "</tr>"
-        if current.month > month and current.weekday() == 0:
-            break
-
-    prev_month = month - 1 if month > 1 else 12
-    next_month = month + 1 if month < 12 else 1
-    prev_year = year - 1 if month == 1 else year
-    next_year = year + 1 if month == 12 else year
-
-    html += f"""
-            </table>
-            <div class="nav-controls">
-                <a href="/calendar?year={prev_year}&month={prev_month}" class="nav-btn">⬅ Previous</a>
-                <a href="/calendar?year={next_year}&month={next_month}" class="nav-btn">Next ➡</a>
-            </div>
-            <a href="/" class="home-btn">🏠 Back to Dashboard</a>
-        </div>
-    </body>
-    </html>
-    """
-    return html
+@app.route("/calendar")
+def calendar_view():
+    storage.snapshot()
+    user_id = g.user["id"]
+    today = date.today()
+    try:
+        year = int(request.args.get("year", today.year))
+        month = int(request.args.get("month", today.month))
+    except ValueError:
+        abort(404)
+
+    if not (1 <= month <= 12 and MINYEAR < year < MAXYEAR):
+        abort(404)
+
+    version, updated_at = storage.version(user_id)
+
+    def render():
+        grid = month_grid(year, month)
+        data = {day.record_date: day.percentage for day in storage.get_range(user_id, grid[0][0][0], grid[-1][-1][0])}
+
+        weeks = []
+        for grid_week in grid:
+            week = []
+            for day_str, day_num, in_month in grid_week:
+                percentage = data.get(day_str)
+                if percentage is None and not in_month:
+                    week.append({"day": day_num, "cls": "gray-day", "link": None})
+                    continue
+                if percentage is None:
+                    class_name = "empty-day"
+                elif percentage > 100:
+                    class_name = "red-day"
+                else:
+                    class_name = "green-day"
+                week.append({"day": day_num, "cls": class_name, "link": f"/edit/{day_str}"})
+            weeks.append(week)
+
+        prev_month = month - 1 if month > 1 else 12
+        next_month = month + 1 if month < 12 else 1
+        prev_year = year - 1 if month == 1 else year
+        next_year = year + 1 if month == 12 else year
+
+        return render_template("calendar.html",
+                               year=year,
+                               month=month,
+                               weeks=weeks,
+                               prev_year=prev_year,
+                               prev_month=prev_month,
+                               next_year=next_year,
+                               next_month=next_month)
+
+    return conditional_page(("calendar", user_id, version, year, month), updated_at, render)
+
+# Dashboard data per (day, window size), kept for a few seconds so reloads
+# don't touch SQLite; every save of the user's days drops it.
+# IRON_DASHBOARD_TTL=0 turns it off.
+dashboard_cache = UserCache(ttl=float(os.environ.get("IRON_DASHBOARD_TTL", "5")))
+
+def dashboard_summary(user_id, today, recent):
+    """(version, updated_at, window) for today and the `recent` days before it."""
+    key = (today, recent)
+    summary = dashboard_cache.get(user_id, key)
+    if summary is None:
+        generation = dashboard_cache.generation(user_id)
+        # Версия и данные из одного снимка БД
+        storage.snapshot()
+        summary = (*storage.version(user_id), storage.recent(user_id, today, recent + 1))
+        dashboard_cache.put(user_id, key, summary, generation)
+    return summary
 
 @app.route("/")
 def dashboard():
-    db = get_db()
+    user_id = g.user["id"]
     today = date.today()
     today_str = today.isoformat()
 
     saved = request.args.get("saved")
 
-    # Гарантируем свежие данные из SQLite
-    db.commit()
+    recent = request.args.get("days", type=int)
+    if recent not in RECENT_WINDOWS:
+        recent = RECENT_WINDOWS[0]
 
-    # === Сегодня ===
-    cur_today = db.execute(
-        "SELECT total_iron, percentage FROM records WHERE user_id = ? AND record_date = ?",
-        (USER_ID, today_str)
-    )
-    today_data = cur_today.fetchone()
+    # Сегодня + последние N дней одним запросом (или из кэша)
+    version, updated_at, window = dashboard_summary(user_id, today, recent)
+    # Страница меняется и при смене даты
+    day_start = datetime.combine(today, time.min).astimezone(timezone.utc)
 
-    perc = round(today_data["percentage"], 1) if today_data else 0
-    total = round(today_data["total_iron"], 2) if today_data else 0
+    def render():
+        # === Сегодня ===
+        today_data = window[0][1]
 
-    today_status = (
-        f"{total} mg — {perc}% of your daily limit."
-        if today_data else "No data yet for today."
-    )
+        perc = round(today_data.percentage, 1) if today_data else 0
+        total = round(today_data.total_iron, 2) if today_data else 0
 
-    # === Последние 5 дней ===
-    recent_days = []
-    for offset in range(1, 6):
-        day = today - timedelta(days=offset)
-        day_str = day.isoformat()
-        cur = db.execute(
-            "SELECT total_iron, percentage FROM records WHERE user_id = ? AND record_date = ?",
-            (USER_ID, day_str)
+        today_status = (
+            f"{total} mg — {perc}% of your daily limit."
+            if today_data else "No data yet for today."
         )
-        row = cur.fetchone()
 
-        if row:
-            total_day = round(row["total_iron"], 2)
-            perc_day = round(row["percentage"], 1)
-            status_icon = "🟩" if perc_day <= 100 else "🟥"
-        else:
-            total_day, perc_day, status_icon = "—", "—", "⬜"
-
-        recent_days.append({
-            "date": day.strftime("%d %b"),
-            "total": total_day,
-            "perc": perc_day,
-            "icon": status_icon,
-            "link": f"/edit/{day_str}"
-        })
-
-    # === Уведомление об успешном сохранении ===
-    alert_html = ""
-    if saved:
-        alert_html = "<div class='alert-success'>✅ Saved successfully!</div>"
-
-    # === HTML ===
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Iron Tracker — Dashboard</title>
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <meta http-equiv="Cache-Control" content="no-cache, no-store, must-revalidate" />
-        <meta http-equiv="Pragma" content="no-cache" />
-        <meta http-equiv="Expires" content="0" />
-        <style>
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
-                background-color: #f9f9f9;
-                padding: 30px;
-                color: #333;
-                max-width: 800px;
-                margin: auto;
-            }}
-            h1 {{
-                font-size: 30px;
-                margin-bottom: 25px;
-            }}
-            .card {{
-                background: #fff;
-                padding: 20px;
-                border-radius: 14px;
-                box-shadow: 0 4px 12px rgba(0,0,0,0.06);
-                margin-bottom: 25px;
-            }}
-            .btn {{
-                display: inline-block;
-                background-color: #007aff;
-                color: white;
-                padding: 10px 18px;
-                border-radius: 10px;
-                text-decoration: none;
-                font-weight: 500;
-                transition: background-color 0.2s;
-            }}
-            .btn:hover {{ background-color: #005ecb; }}
-            .calendar-btn {{
-                background-color: #e5e5ea;
-                color: #333;
-                margin-top: 10px;
-            }}
-            .calendar-btn:hover {{ background-color: #d1d1d6; }}
-            .today-status {{
-                color: #666;
-                margin-top: 8px;
-                font-size: 16px;
-            }}
-            /* === Прогресс-бар === */
-            .progress-container {{
-                width: 100%;
-                height: 16px;
-                background-color: #eee;
-                border-radius: 8px;
-                overflow: hidden;
-                margin-top: 10px;
-            }}
-            .progress-bar {{
-                height: 100%;
-                transition: width 0.5s ease-in-out;
-                border-radius: 8px;
-            }}
-            .progress-label {{
-                margin-top: 6px;
-                font-size: 15px;
-                color: #555;
-            }}
-            /* === Таблица последних дней === */
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin-top: 10px;
-            }}
-            th, td {{
-                text-align: left;
-                padding: 10px;
-                border-bottom: 1px solid #eee;
-                font-size: 16px;
-            }}
-            th {{
-                color: #666;
-                font-weight: 600;
-                border-bottom: 2px solid #ccc;
-            }}
-            td a {{
-                text-decoration: none;
-                color: #333;
-                font-weight: 500;
-            }}
-            td a:hover {{ text-decoration: underline; }}
-            /* === Уведомление === */
-            .alert-success {{
-                background-color: #d4edda;
-                color: #155724;
-                padding: 12px 18px;
-                border-radius: 10px;
-                margin-bottom: 20px;
-                font-size: 16px;
-                box-shadow: 0 2px 6px rgba(0,0,0,0.1);
-                animation: fadeOut 3s forwards;
-            }}
-            @keyframes fadeOut {{
-                0% {{ opacity: 1; }}
-                80% {{ opacity: 1; }}
-                100% {{ opacity: 0; display: none; }}
-            }}
-        </style>
-    </head>
-    <body>
-        {alert_html}
-        <h1>Iron Tracker</h1>
-
-        <div class="card">
-            <h2>📅 Today: {today_str}</h2>
-            <p class="today-status">{today_status}</p>
-
-            {f"""
-            <div class='progress-container'>
-                <div class='progress-bar' 
-                     style='width:{min(perc, 100)}%; 
-                            background-color:{"#28a745" if perc < 80 else ("#ffcc00" if perc <= 100 else "#ff3b30")};'>
-                </div>
-            </div>
-            <p class='progress-label'>
-                {perc}% of your daily limit{' <span style="color:#ff3b30;">(Exceeded!)</span>' if perc > 100 else ''}
-            </p>
-            """ if today_data else ""}
-
-            <a href="/edit/{today_str}" class="btn">➕ Add or Edit Today</a>
-        </div>
-
-        <div class="card">
-            <h2>🕓 Recent Days</h2>
-            <table>
-                <tr><th>Date</th><th>Iron (mg)</th><th>% of norm</th><th>Status</th></tr>
-                {''.join(f'<tr><td><a href="{d["link"]}">{d["date"]}</a></td><td>{d["total"]}</td><td>{d["perc"]}</td><td style="font-size:20px;">{d["icon"]}</td></tr>' for d in recent_days)}
-            </table>
-        </div>
-
-        <div class="card">
-            <h2>📆 Full History</h2>
-            <a href="/calendar" class="btn calendar-btn">Open Calendar</a>
-        </div>
-    </body>
-    </html>
+        # === Последние N дней ===
+        recent_days = []
+        for day, row in window[1:]:
+            day_str = day.isoformat()
+            if row:
+                total_day = round(row.total_iron, 2)
+                perc_day = round(row.percentage, 1)
+                status_icon = "🟩" if perc_day <= 100 else "🟥"
+            else:
+                total_day, perc_day, status_icon = "—", "—", "⬜"
+
+            recent_days.append({
+                "date": day.strftime("%d %b"),
+                "total": total_day,
+                "perc": perc_day,
+                "icon": status_icon,
+                "link": f"/edit/{day_str}"
+            })
+
+        return render_template("dashboard.html",
+                               saved=saved,
+                               today_str=today_str,
+                               today_status=today_status,
+                               today_data=today_data,
+                               perc=perc,
+                               windows=RECENT_WINDOWS,
+                               recent=recent,
+                               recent_days=recent_days)
+
+    return conditional_page(("dashboard", user_id, version, today_str, recent, saved),
+                            max(filter(None, (updated_at, day_start))), render)
+
+# === YEAR HEATMAP ===
+# One cell per day for a year (or any range up to HEATMAP_MAX_DAYS), from a
+# single range query. Grids are kept until a save touches a day inside them,
+# IRON_HEATMAP_CACHE_SIZE of them across all users (a five-year grid is ~300 KB).
+HEATMAP_MAX_DAYS = 5 * 366
+heatmap_cache = UserCache(ttl=None, max_per_user=8,
+                          max_entries=int(os.environ.get("IRON_HEATMAP_CACHE_SIZE", "256")))
+
+def heatmap_class(percentage):
+    if percentage is None:
+        return "none"
+    if percentage > 100:
+        return "over"
+    return "l1" if percentage <= 33 else "l2" if percentage <= 66 else "l3"
+
+def heatmap(user_id, start, end):
+    """Weeks (Monday first) of (iso date, class, percentage) cells for start..end.
+
+    Days outside the range inside the first and last week are None.
     """
-    return html
+    key = (start.isoformat(), end.isoformat())
+    weeks = heatmap_cache.get(user_id, key)
+    if weeks is None:
+        generation = heatmap_cache.generation(user_id)
+        data = {day.record_date: day.percentage for day in storage.get_range(user_id, *key)}
+        first = start - timedelta(days=start.weekday())
+        cells = []
+        for offset in range((end - first).days + 1):
+            day = first + timedelta(days=offset)
+            if day < start:
+                cells.append(None)
+                continue
+            iso = day.isoformat()
+            percentage = data.get(iso)
+            cells.append((iso, heatmap_class(percentage), percentage))
+        cells.extend([None] * (-len(cells) % 7))
+        weeks = tuple(tuple(cells[i:i + 7]) for i in range(0, len(cells), 7))
+        heatmap_cache.put(user_id, key, weeks, generation)
+    return weeks
+
+def heatmap_range():
+    """(start, end) from ?from=&to= or ?year= (default: this year); ValueError if invalid."""
+    today = date.today()
+    if "from" in request.args or "to" in request.args:
+        start = date.fromisoformat(request.args.get("from", f"{today.year}-01-01"))
+        end = date.fromisoformat(request.args.get("to", today.isoformat()))
+    else:
+        year = int(request.args.get("year", today.year))
+        start, end = date(year, 1, 1), date(year, 12, 31)
+    if not timedelta(0) <= end - start < timedelta(days=HEATMAP_MAX_DAYS):
+        raise ValueError(f"the range must be 1 to {HEATMAP_MAX_DAYS} days")
+    return start, end
+
+def records_changed(user_id, start, end=None):
+    """Drop cached views of the user's days start..end (exclusive; None: open).
+
+    Call after the writing transaction has committed.
+    """
+    dashboard_cache.invalidate(user_id)
+    page_cache.invalidate_user(user_id)
+    heatmap_cache.invalidate(user_id, lambda key: key[1] >= start and (end is None or key[0] < end))
+
+@app.route("/year")
+def year_view():
+    user_id = g.user["id"]
+    try:
+        start, end = heatmap_range()
+    except ValueError:
+        abort(404)
+    version, updated_at = storage.version(user_id)
+
+    def render():
+        weeks = heatmap(user_id, start, end)
+        cells = [cell for week in weeks for cell in week if cell]
+        whole_year = start.month == 1 and start.day == 1 and end == date(start.year, 12, 31)
+        return render_template("year.html",
+                               weeks=weeks,
+                               start=start,
+                               end=end,
+                               year=start.year if whole_year else None,
+                               recorded=sum(cell[2] is not None for cell in cells),
+                               over=sum(cell[1] == "over" for cell in cells))
+
+    return conditional_page(("year", user_id, version, start, end), updated_at, render)
+
+# === IMPORT / EXPORT ===
+# CSV has one row per item (a day without items is a row with an empty
+# product); NDJSON has one object per day. Both are read and written in
+# fixed-size chunks, so memory use doesn't depend on the file size.
+CSV_FIELDS = ["date", "product", "grams", "iron_mg"]
+EXPORT_CHUNK_DAYS = 1000
+IMPORT_BATCH_DAYS = 1000
+
+def iter_day_chunks(db, user_id, chunk_days=EXPORT_CHUNK_DAYS):
+    """All of a user's days in date order, as lists of (record, items)."""
+    last_date = ""
+    while True:
+        records = db.execute(
+            """
+            SELECT id, record_date, total_iron, percentage, items_json FROM records
+            WHERE user_id = ? AND record_date > ? ORDER BY record_date LIMIT ?
+            """,
+            (user_id, last_date, chunk_days)
+        ).fetchall()
+        if not records:
+            return
+        items = load_items_many(db, records)
+        yield [(record, items[record["id"]]) for record in records]
+        last_date = records[-1]["record_date"]
+
+def csv_chunk(days, header=False):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(CSV_FIELDS)
+    for record, items in days:
+        if not items:
+            writer.writerow([record["record_date"], "", "", ""])
+        for item in items:
+            writer.writerow([record["record_date"], item["product"], item["grams"], item["iron"]])
+    return out.getvalue()
+
+def ndjson_chunk(days):
+    return "".join(
+        json.dumps({
+            "date": record["record_date"],
+            "total_iron": record["total_iron"],
+            "percentage": record["percentage"],
+            "items": [{"product": i["product"], "grams": i["grams"], "iron_mg": i["iron"]} for i in items],
+        }, ensure_ascii=False) + "\n"
+        for record, items in days
+    )
+
+def parse_item(product, grams, iron_mg=None):
+    """One imported item; ValueError (FormErrors) says what is wrong with it.
+
+    Without iron_mg the product must be in the catalog, as on the edit page.
+    """
+    if iron_mg in (None, ""):
+        items = parse_items([("{}", product, grams)], food_index())
+        if not items:
+            raise FormErrors([{"field": "product", "message": "enter a product"}])
+        return items[0]
+    amount, iron = parse_amount(grams), parse_amount(iron_mg)
+    product = product.strip() if isinstance(product, str) else None
+    errors = [{"field": field, "message": message} for field, message, bad in (
+        ("product", "enter a product", not product),
+        ("grams", "must be a number, 0 or more", amount is None),
+        ("iron_mg", "must be a number, 0 or more", iron is None),
+    ) if bad]
+    if errors:
+        raise FormErrors(errors)
+    return {"product": product, "grams": round(amount, 2), "iron": round(iron, 2)}
+
+def read_csv_days(lines):
+    """(record_date, items) per day; rows of one day must be consecutive."""
+    reader = csv.DictReader(lines)
+    missing = set(CSV_FIELDS[:3]) - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"missing CSV columns: {', '.join(sorted(missing))}")
+    current, items = None, []
+    done = set()
+    for row in reader:
+        try:
+            record_date = date.fromisoformat(row["date"]).isoformat()
+            if record_date != current and record_date in done:
+                raise ValueError(f"rows of {record_date} must be consecutive")
+            item = parse_item(row["product"], row["grams"], row.get("iron_mg")) if row["product"] else None
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"line {reader.line_num}: {e}") from None
+        if record_date != current:
+            if current is not None:
+                done.add(current)
+                yield current, items
+            current, items = record_date, []
+        if item is not None:
+            items.append(item)
+    if current is not None:
+        yield current, items
+
+def read_ndjson_days(lines):
+    done = set()
+    for line_num, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+            record_date = date.fromisoformat(obj["date"]).isoformat()
+            if record_date in done:
+                raise ValueError(f"{record_date} appears more than once")
+            items = [parse_item(i["product"], i["grams"], i.get("iron_mg")) for i in obj.get("items", [])]
+        except KeyError as e:
+            raise ValueError(f"line {line_num}: missing {e}") from None
+        except (TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"line {line_num}: {e}") from None
+        done.add(record_date)
+        yield record_date, items
+
+@app.route("/export.<fmt>")
+@needs_sqlite
+def export_records(fmt):
+    if fmt not in ("csv", "ndjson"):
+        abort(404)
+    db = get_db()
+    user_id = g.user["id"]
+
+    def generate():
+        for number, days in enumerate(iter_day_chunks(db, user_id)):
+            yield csv_chunk(days, header=number == 0) if fmt == "csv" else ndjson_chunk(days)
+
+    response = app.response_class(stream_with_context(generate()),
+                                  mimetype="text/csv" if fmt == "csv" else "application/x-ndjson")
+    response.headers["Content-Disposition"] = f"attachment; filename=iron-records.{fmt}"
+    return response
+
+@app.route("/import", methods=["POST"])
+@needs_sqlite
+def import_records():
+    """Import a CSV or NDJSON file (multipart field "file" or the raw body).
+
+    Days are upserted in batches of IMPORT_BATCH_DAYS, one transaction each;
+    on a bad line the batches before it stay imported.
+    """
+    user_id = g.user["id"]
+    norm_for = norm_schedule(get_db(), user_id)
+    upload = request.files.get("file")
+    stream, filename = (upload.stream, upload.filename or "") if upload else (request.stream, "")
+    fmt = request.args.get("format")
+    if fmt is None:
+        ndjson = filename.endswith((".ndjson", ".jsonl")) or request.mimetype == "application/x-ndjson"
+        fmt = "ndjson" if ndjson else "csv"
+    lines = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    days = read_ndjson_days(lines) if fmt == "ndjson" else read_csv_days(lines)
+
+    imported = 0
+    try:
+        while True:
+            batch = {record_date: items for record_date, items in islice(days, IMPORT_BATCH_DAYS)}
+            if not batch:
+                break
+            with write_db() as wdb:
+                save_days(wdb, user_id, [(d, *day_totals(items, norm_for(d)), items) for d, items in batch.items()])
+                refresh_rollups(wdb, user_id, min(batch), max(batch))
+                bump_data_version(wdb, user_id)
+            records_changed(user_id, min(batch), next_day(max(batch)))
+            imported += len(batch)
+    except (ValueError, csv.Error) as e:
+        return jsonify(imported=imported, error=str(e)), 400
+    return jsonify(imported=imported)
+
+@app.cli.command("import-foods")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def import_foods(path):
+    """Add or update catalog foods from a CSV with name,iron_per_100g columns."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = ((row["name"].strip(), float(row["iron_per_100g"])) for row in csv.DictReader(f))
+        count = 0
+        while True:
+            batch = list(islice(rows, 1000))
+            if not batch:
+                break
+            with write_db() as wdb:
+                add_foods(wdb, batch)
+            count += len(batch)
+    click.echo(f"Imported {count} foods.")
+
+@app.route("/stats/pool")
+def pool_stats():
+    return jsonify(dict(pool.stats(), group_commit=write_queue.stats() if write_queue else None))
+
+@app.route("/stats/cache")
+def cache_stats():
+    return jsonify(pages=page_cache.stats(), dashboard=dashboard_cache.stats(), heatmap=heatmap_cache.stats())
+
+@app.route("/stats/metrics")
+def metrics_stats():
+    return jsonify({"enabled": metrics.enabled, "slow_ms": metrics.slow_ms, "endpoints": metrics.snapshot()})
+
+# === JSON API ===
+# Same data access as the pages, for clients that don't want HTML. GETs are
+# conditional (ETag per user data version) like the pages; batched writes
+# commit once per request.
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid date: {value!r}") from None
+
+def items_from_json(raw):
+    return parse_items(json_rows(raw), food_index())
+
+def day_json(day):
+    result = {"date": day.record_date, "total_iron": day.total_iron, "percentage": day.percentage}
+    if day.items is not None:
+        result["items"] = [{"product": i["product"], "grams": i["grams"], "iron_mg": i["iron"]} for i in day.items]
+    return result
+
+def api_conditional(key, render):
+    version, updated_at = storage.version(g.user["id"])
+    return conditional_page(("api", g.user["id"], version, *key), updated_at, render)
+
+def save_days_json(entries):
+    """Validate then save [{"date", "items", "norm"?}] in one transaction."""
+    user_id = g.user["id"]
+    days = []
+    for n, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValueError(f"days[{n}]: must be an object")
+        record_date = parse_date(entry.get("date"))
+        if entry.get("norm") is None:
+            norm = storage.norm_on(user_id, record_date)
+        else:
+            # same rule as the edit form: NaN, Infinity and booleans are not limits
+            norm = parse_amount(entry["norm"])
+            if not norm:
+                raise FormErrors([{"field": f"days[{n}].norm", "message": "the daily limit must be a number above 0"}])
+        days.append((record_date, items_from_json(entry.get("items", [])), norm))
+    for _, _, (start, end) in storage.put_days(user_id, days):
+        records_changed(user_id, start, end)
+    return [record_date for record_date, _, _ in days]
+
+@api.errorhandler(ValueError)
+def api_bad_request(e):
+    if isinstance(e, FormErrors):
+        return jsonify(error=str(e), errors=e.errors), 400
+    return jsonify(error=str(e)), 400
+
+@api.route("/days/<day>")
+def api_get_day(day):
+    record_date = parse_date(day)
+
+    def render():
+        record = storage.get_day(g.user["id"], record_date)
+        if record is None:
+            return jsonify(error="no record for this day"), 404
+        return jsonify(day_json(record))
+    return api_conditional(("day", record_date), render)
+
+@api.route("/days/<day>", methods=["PUT"])
+def api_put_day(day):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        raise ValueError("expected a JSON object")
+    save_days_json([dict(body, date=day)])
+    return jsonify(day_json(storage.get_day(g.user["id"], parse_date(day))))
+
+@api.route("/days", methods=["POST"])
+def api_save_days():
+    """Save many days at once: {"days": [{"date", "items", "norm"?}, ...]}."""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get("days"), list):
+        raise ValueError('expected {"days": [...]}')
+    return jsonify(saved=save_days_json(body["days"]))
+
+@api.route("/days")
+def api_range():
+    """Recorded days between ?from= and ?to=; ?items=1 adds each day's items."""
+    start = parse_date(request.args.get("from"))
+    end = parse_date(request.args.get("to", date.today().isoformat()))
+    with_items = request.args.get("items") == "1"
+
+    def render():
+        return jsonify(days=[day_json(day) for day in storage.get_range(g.user["id"], start, end, items=with_items)])
+    return api_conditional(("range", start, end, with_items), render)
+
+@api.route("/dashboard")
+def api_dashboard():
+    today = date.today()
+    recent = request.args.get("days", RECENT_WINDOWS[0], type=int)
+    if not 1 <= recent <= max(RECENT_WINDOWS):
+        raise ValueError(f"days must be between 1 and {max(RECENT_WINDOWS)}")
+
+    def render():
+        window = storage.recent(g.user["id"], today, recent + 1)
+        days = [{"date": day.isoformat(),
+                 "total_iron": row.total_iron if row else None,
+                 "percentage": row.percentage if row else None}
+                for day, row in window]
+        return jsonify(today=days[0], recent=days[1:])
+    return api_conditional(("dashboard", today.isoformat(), recent), render)
+
+@api.route("/trends/<period>")
+@needs_sqlite
+def trends(period):
+    """Per-day, week or month totals for ?year= or ?from=&to= (default: last 365 days)."""
+    if period != "day" and period not in ROLLUP_PERIODS:
+        abort(404)
+    today = date.today()
+    try:
+        if "year" in request.args:
+            year = int(request.args["year"])
+            start, end = date(year, 1, 1), date(year, 12, 31)
+        else:
+            start = date.fromisoformat(request.args.get("from", (today - timedelta(days=365)).isoformat()))
+            end = date.fromisoformat(request.args.get("to", today.isoformat()))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    db = get_db()
+    if period == "day":
+        cur = db.execute(
+            """
+            SELECT record_date, 1, total_iron, percentage, percentage > 100 FROM records
+            WHERE user_id = ? AND record_date BETWEEN ? AND ? ORDER BY record_date
+            """,
+            (g.user["id"], start.isoformat(), end.isoformat())
+        )
+    else:
+        cur = db.execute(
+            """
+            SELECT period_start, days, total_iron, percentage_sum / days, days_over FROM rollups
+            WHERE user_id = ? AND period = ? AND period_start BETWEEN ? AND ? ORDER BY period_start
+            """,
+            # whole buckets overlapping the range, including the one start falls in
+            (g.user["id"], period, ROLLUP_PERIODS[period][1](start).isoformat(), end.isoformat())
+        )
+    points = [
+        {"start": start_, "days": days, "total_iron": round(total, 2),
+         "mean_percentage": round(mean, 2), "days_over": days_over}
+        for start_, days, total, mean, days_over in cur.fetchall()
+    ]
+    return jsonify(period=period, start=start.isoformat(), end=end.isoformat(), points=points)
+
+@api.route("/heatmap")
+def api_heatmap():
+    """Percentage per day for ?year= or ?from=&to=, from the same cache as /year."""
+    start, end = heatmap_range()
+
+    def render():
+        weeks = heatmap(g.user["id"], start, end)
+        return jsonify(start=start.isoformat(), end=end.isoformat(),
+                       days={cell[0]: cell[2] for week in weeks for cell in week if cell and cell[2] is not None})
+    return api_conditional(("heatmap", start, end), render)
+
+@api.route("/foods")
+def api_foods():
+    limit = min(request.args.get("limit", 20, type=int), 100)
+    matches = food_index().search(request.args.get("q", ""), limit)
+    return jsonify([{"id": food_id, "name": name, "iron_per_100g": iron} for name, food_id, iron in matches])
+
+# Longest range the analytics endpoints build arrays and responses for
+ANALYTICS_MAX_DAYS = 10 * 366
+
+def analytics_range():
+    """?from=&to= as dates, at most ANALYTICS_MAX_DAYS apart; from defaults
+    to the first record (or the earliest day allowed), to to today."""
+    start = request.args.get("from")
+    start = date.fromisoformat(parse_date(start)) if start else None
+    end = date.fromisoformat(parse_date(request.args.get("to", date.today().isoformat())))
+    if start and start > end:
+        raise ValueError("from is after to")
+    if start is None:
+        first = read_snapshot().execute(
+            "SELECT MIN(record_date) FROM records WHERE user_id = ? AND record_date <= ?",
+            (g.user["id"], end.isoformat())
+        ).fetchone()[0]
+        if first is None:
+            return None, end
+        try:
+            earliest = end - timedelta(days=ANALYTICS_MAX_DAYS - 1)
+        except OverflowError:
+            earliest = date.min
+        start = max(date.fromisoformat(first), earliest)
+    if (end - start).days >= ANALYTICS_MAX_DAYS:
+        raise ValueError(f"the range must be at most {ANALYTICS_MAX_DAYS} days")
+    return start, end
+
+def nullable(values):
+    return [None if v != v else round(float(v), 2) for v in values]  # NaN -> None
+
+@api.route("/analytics")
+@needs_sqlite
+def api_analytics():
+    """Summary, streaks over/under the limit, weekday pattern and per-product shares."""
+    start, end = analytics_range()
+
+    def render():
+        import analytics  # numpy; imported by the first analytics request, not at startup
+        db = read_snapshot()
+        history = analytics.History.load(db, g.user["id"], start, end)
+        days, iron, percentage, over = history.weekdays()
+        first = history.start.isoformat()
+        return jsonify(
+            start=first,
+            end=end.isoformat(),
+            summary=history.summary(),
+            streaks=history.streaks(),
+            weekdays=[{"weekday": n, "days": int(d), "mean_iron": i, "mean_percentage": p, "days_over": int(o)}
+                      for n, d, i, p, o in zip(range(7), days, nullable(iron), nullable(percentage), over)],
+            products=analytics.contributions(product_totals(db, g.user["id"], first, end.isoformat())),
+        )
+    return api_conditional(("analytics", start, end), render)
+
+@api.route("/analytics/rolling")
+@needs_sqlite
+def api_rolling():
+    """Trailing ?window=N day averages (default 7) for every day in the range."""
+    start, end = analytics_range()
+    window = request.args.get("window", 7, type=int)
+    if not 1 <= window <= 365:
+        raise ValueError("window must be between 1 and 365")
+
+    def render():
+        # load window-1 extra days so the first points average a full window
+        import analytics
+        lead = start - timedelta(days=min(window - 1, (start - date.min).days)) if start else None
+        history = analytics.History.load(read_snapshot(), g.user["id"], lead, end)
+        skip = max(0, (start - history.start).days) if start else 0
+        iron, percentage = (nullable(a[skip:]) for a in history.rolling_mean(window))
+        first = history.start + timedelta(days=skip)
+        return jsonify(window=window, start=first.isoformat(), end=end.isoformat(),
+                       points=[{"date": (first + timedelta(days=n)).isoformat(), "mean_iron": i, "mean_percentage": p}
+                               for n, (i, p) in enumerate(zip(iron, percentage))])
+    return api_conditional(("rolling", start, end, window), render)
+
+app.register_blueprint(api)
 
 if __name__ == "__main__":
-    init_db()
+    ensure_schema()
     app.run(debug=True)
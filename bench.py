@@ -0,0 +1,762 @@
+# bench.py
+"""Benchmarks for Iron Tracker.
+
+    python bench.py records --rows 1000000
+    python bench.py load --threads 8 --seconds 10
+    python bench.py render
+    python bench.py users --users 10000
+    python bench.py io --days 100000
+    python bench.py http --concurrency 16 [--async]
+    python bench.py bytes
+    python bench.py form --items 10 100 500
+    python bench.py suite --users 10 --years 3 --items 4 --save before.json
+    python bench.py suite --users 10 --years 3 --items 4 --compare before.json
+    python bench.py suite --storage memory
+    python bench.py startup --runs 10
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import flask
+
+import app as iron
+from db import ConnectionPool, WriteQueue
+from forms import form_rows, parse_items
+from storage import MemoryStorage
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"  {label:<10} p50={percentile(ms, 50):.3f}ms  p99={percentile(ms, 99):.3f}ms")
+
+
+def use_database(path):
+    """Point the app at a fresh database file and create its schema."""
+    iron.DATABASE = path
+    iron.pool = ConnectionPool(path)
+    if iron.write_queue is not None:
+        iron.write_queue.close()
+        iron.write_queue = WriteQueue(iron.pool)
+    iron.dashboard_cache.clear()
+    iron.heatmap_cache.clear()
+    iron.page_cache.clear()
+    iron.ensure_schema()
+
+
+def child_env(path):
+    """Environment for an app process of its own on database path."""
+    return dict(os.environ, IRON_DB=path, IRON_SECRET_KEY=os.environ.get("IRON_SECRET_KEY") or "bench")
+
+
+def temp_database():
+    return os.path.join(tempfile.mkdtemp(), "bench.db")
+
+
+def client_for(user_id):
+    """Test client with a session for user_id (skips password hashing)."""
+    client = iron.app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+    return client
+
+
+def add_users(first_id, last_id):
+    with iron.write_db() as db:
+        db.executemany(
+            "INSERT INTO users (id, username) VALUES (?, ?)",
+            ((n, f"bench{n}") for n in range(first_id, last_id + 1))
+        )
+
+
+# === records: save/lookup latency vs table size ===
+
+def fill_records(db, start_rows, end_rows, users, first_day):
+    """Append synthetic rows (round-robin over users, one day each)."""
+    def rows():
+        for n in range(start_rows, end_rows):
+            day = first_day + timedelta(days=n // users)
+            yield (n % users + 1, day.isoformat(), 10.0, 66.67, "[]")
+    db.executemany(
+        "INSERT OR IGNORE INTO records (user_id, record_date, total_iron, percentage, items_json) VALUES (?, ?, ?, ?, ?)",
+        rows()
+    )
+    db.commit()
+
+
+def bench_records(args):
+    db = sqlite3.connect(temp_database())
+    db.row_factory = sqlite3.Row
+    iron.migrate(db)
+
+    first_day = date(2000, 1, 1)
+    checkpoints = [n for n in (10_000, 100_000, 1_000_000, 10_000_000) if n < args.rows] + [args.rows]
+    filled = 0
+    rng = random.Random(42)
+    items = [{"product": "Lentils", "grams": 150.0, "iron": 4.95}]
+
+    for target in checkpoints:
+        fill_records(db, filled, target, args.users, first_day)
+        filled = target
+        span = filled // args.users
+
+        saves, lookups = [], []
+        for _ in range(args.ops):
+            user_id = rng.randint(1, args.users)
+            day = (first_day + timedelta(days=rng.randrange(span + 30))).isoformat()
+
+            t0 = time.perf_counter()
+            iron.save_record(db, user_id, day, 4.95, 33.0, items)
+            db.commit()
+            saves.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            db.execute("SELECT * FROM records WHERE user_id = ? AND record_date = ?", (user_id, day)).fetchone()
+            lookups.append(time.perf_counter() - t0)
+
+        print(f"{filled:>10} rows")
+        report("save", saves)
+        report("lookup", lookups)
+
+    db.close()
+
+
+# === load: concurrent saves and reads through the app ===
+
+def bench_load(args):
+    if args.group_commit:
+        iron.write_queue = WriteQueue(iron.pool)
+    use_database(temp_database())
+    add_users(1, args.threads)
+    first_day = date.today() - timedelta(days=args.days)
+    deadline = time.perf_counter() + args.seconds
+    results = []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = client_for(seed + 1)
+        saves, reads = [], []
+        while time.perf_counter() < deadline:
+            day = (first_day + timedelta(days=rng.randrange(args.days))).isoformat()
+            t0 = time.perf_counter()
+            if rng.random() < args.write_ratio:
+                client.post(f"/edit/{day}", data={"norm": "15", "product_0": "Tofu", "grams_0": str(rng.randint(10, 300))})
+                saves.append(time.perf_counter() - t0)
+            else:
+                client.get("/" if rng.random() < 0.5 else f"/edit/{day}")
+                reads.append(time.perf_counter() - t0)
+        results.append((saves, reads))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    saves = [s for r in results for s in r[0]]
+    reads = [s for r in results for s in r[1]]
+    print(f"{args.threads} threads, {args.seconds}s: "
+          f"{(len(saves) + len(reads)) / args.seconds:.0f} req/s "
+          f"({len(saves)} saves, {len(reads)} reads)")
+    if saves:
+        report("save", saves)
+    if reads:
+        report("read", reads)
+    print("  pool", iron.pool.stats())
+    if iron.write_queue is not None:
+        print("  group commit", iron.write_queue.stats())
+
+
+# === render: edit page, per-request template string vs cached template ===
+
+def bench_render(args):
+    app = iron.app
+    with open(os.path.join(app.root_path, app.template_folder, "edit.html"), encoding="utf-8") as f:
+        source = f.read()
+    context = {
+        "product_count": 3,
+        "selections": [{"product": "Tofu", "grams": 100.0, "iron": 5.4}] * 3,
+        "total": 16.2,
+        "status": "This is 108.0% of your daily limit.",
+        "norm": 15.0,
+        "day_text": " for 2025-01-01",
+    }
+
+    def before():
+        return flask.render_template_string(source, **context)
+
+    def after():
+        return flask.render_template("edit.html", **context)
+
+    with app.test_request_context():
+        assert before() == after()
+        for label, render in (("before", before), ("after", after)):
+            samples = []
+            for _ in range(args.n):
+                t0 = time.perf_counter()
+                render()
+                samples.append(time.perf_counter() - t0)
+            report(label, samples)
+
+
+# === users: per-user page latency vs total number of users ===
+
+def bench_users(args):
+    use_database(temp_database())
+    today = date.today()
+    days = [(today - timedelta(days=n)).isoformat() for n in range(args.days)]
+    checkpoints = [n for n in (10, 100, 1000, 10_000, 100_000) if n < args.users] + [args.users]
+    rng = random.Random(42)
+    filled = 0
+
+    for target in checkpoints:
+        add_users(filled + 1, target)
+        with iron.write_db() as db:
+            db.executemany(
+                "INSERT INTO records (user_id, record_date, total_iron, percentage, items_json) VALUES (?, ?, ?, ?, NULL)",
+                ((user_id, day, 12.0, 80.0) for user_id in range(filled + 1, target + 1) for day in days)
+            )
+        filled = target
+
+        latencies = {"/": [], "/calendar": [], "/edit": []}
+        for _ in range(args.ops):
+            client = client_for(rng.randint(1, filled))
+            for route, samples in latencies.items():
+                url = f"/edit/{rng.choice(days)}" if route == "/edit" else route
+                t0 = time.perf_counter()
+                client.get(url)
+                samples.append(time.perf_counter() - t0)
+
+        print(f"{filled:>8} users")
+        for route, samples in latencies.items():
+            report(route, samples)
+
+
+# === io: streaming CSV import/export ===
+
+def bench_io(args):
+    use_database(temp_database())
+    add_users(1, 1)
+    client = client_for(1)
+    path = os.path.join(tempfile.mkdtemp(), "import.csv")
+    first_day = date(1900, 1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("date,product,grams,iron_mg\n")
+        for n in range(args.days):
+            day = (first_day + timedelta(days=n)).isoformat()
+            for product in ("Tofu", "Oats", "Spinach")[:args.items]:
+                f.write(f"{day},{product},100,\n")
+    print(f"{args.days * args.items} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        # input_stream, not data=: the test client would read data= into memory
+        response = client.post("/import", input_stream=f, content_type="text/csv",
+                               content_length=os.path.getsize(path))
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    print(f"  import   {response.get_json()} in {elapsed:.2f}s, peak {peak / 1e6:.1f} MB")
+
+    tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    response = client.get("/export.csv", buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    print(f"  export   {size / 1e6:.1f} MB in {elapsed:.2f}s, peak {peak / 1e6:.1f} MB")
+    tracemalloc.stop()
+
+
+# === form: parsing and saving large edit submissions ===
+
+def legacy_form_items(form, foods):
+    """handle_day's parsing before forms.py: probe product_i/grams_i until the first gap."""
+    selections = []
+    i = 0
+    while True:
+        p_key = f"product_{i}"
+        g_key = f"grams_{i}"
+        if p_key in form and g_key in form:
+            name = form[p_key].strip()
+            name = foods.lookup(name) or name
+            grams = float(form[g_key])
+            selections.append({"product": name, "grams": round(grams, 2),
+                               "iron": round(((foods.iron(name) or 0) / 100) * grams, 2)})
+            i += 1
+        else:
+            break
+    return selections
+
+
+def bench_form(args):
+    use_database(temp_database())
+    add_users(1, 1)
+    client = client_for(1)
+    names = list(iron.IRON_DATA)
+    with iron.app.app_context():
+        foods = iron.food_index()
+
+    for count in args.items:
+        products = [names[n % len(names)] for n in range(count)]
+        grams = [str(10 + n % 290) for n in range(count)]
+        numbered = {"norm": "15"}
+        for n, (product, amount) in enumerate(zip(products, grams)):
+            numbered[f"product_{n}"] = product
+            numbered[f"grams_{n}"] = amount
+        repeated = flask.wrappers.Request.parameter_storage_class(
+            [("norm", "15")] + [pair for p, a in zip(products, grams) for pair in (("product", p), ("grams", a))])
+        numbered_form = flask.wrappers.Request.parameter_storage_class(numbered)
+        body = {"norm": 15, "items": [{"product": p, "grams": float(a)} for p, a in zip(products, grams)]}
+
+        print(f"{count} items")
+        for label, parse in (("parse old", lambda: legacy_form_items(numbered_form, foods)),
+                             ("parse new", lambda: parse_items(form_rows(numbered_form), foods))):
+            samples = []
+            for _ in range(args.n):
+                t0 = time.perf_counter()
+                parse()
+                samples.append(time.perf_counter() - t0)
+            report(label, samples)
+        for label, kwargs in (("POST N_", {"data": numbered}), ("POST list", {"data": repeated}),
+                              ("POST json", {"json": body})):
+            samples = []
+            for n in range(args.n // 10):
+                t0 = time.perf_counter()
+                response = client.post(f"/edit/2025-01-{n % 28 + 1:02d}", **kwargs)
+                samples.append(time.perf_counter() - t0)
+                assert response.status_code in (200, 302), response.status_code
+            report(label, samples)
+
+
+# === bytes: transfer size per page view ===
+
+def bench_bytes(args):
+    use_database(temp_database())
+    generate(1, 1, 3, 42)
+    pages = {"/": client_for(1), "/calendar": client_for(1), f"/edit/{date.today().isoformat()}": client_for(1),
+             "/login": iron.app.test_client()}
+    encoding = "br, gzip" if iron.brotli else "gzip"
+    print(f"bytes per view (Accept-Encoding: {encoding})")
+    print(f"  {'page':<18} {'inline':>8} {'html':>8} {'first':>8} {'repeat':>8}")
+    for url, client in pages.items():
+        plain = client.get(url)
+        compressed = client.get(url, headers={"Accept-Encoding": encoding})
+        assets = re.findall(r'(?:href|src)="(/static/[^"]+)"', plain.get_data(as_text=True))
+        assets_plain = sum(len(client.get(a).data) for a in assets)
+        assets_compressed = sum(len(client.get(a, headers={"Accept-Encoding": encoding}).data) for a in assets)
+        # inline: what the page weighed with its CSS/JS in the HTML and no compression
+        print(f"  {url[:18]:<18} {len(plain.data) + assets_plain:>8} {len(plain.data):>8} "
+              f"{len(compressed.data) + assets_compressed:>8} {len(compressed.data):>8}")
+
+
+# === http: serve.py under load, req/s and latency per route ===
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def bench_http(args):
+    path = temp_database()
+    use_database(path)
+    today = date.today()
+    items = [{"product": "Tofu", "grams": 100.0, "iron": 5.4}, {"product": "Oats", "grams": 60.0, "iron": 2.58}]
+    with iron.write_db() as db:
+        user_id = iron.create_user(db, "bench", "bench")
+        iron.save_days(db, user_id, [((today - timedelta(days=n)).isoformat(), 7.98, 53.2, items)
+                                     for n in range(args.days)])
+
+    port = free_port()
+    mode = ["--async", "--db-workers", str(args.workers)] if args.use_async else ["--threads", str(args.workers)]
+    server = subprocess.Popen([sys.executable, "serve.py", "--port", str(port), *mode],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              env=child_env(path),
+                              stderr=subprocess.DEVNULL)  # waitress logs every queued task under load
+    try:
+        wait_for_port(port)
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("POST", "/login", body="username=bench&password=bench",
+                     headers={"Content-Type": "application/x-www-form-urlencoded"})
+        response = conn.getresponse()
+        response.read()
+        cookie = response.getheader("Set-Cookie").split(";")[0]
+        conn.close()
+
+        routes = {
+            "/": lambda rng: "/",
+            "/calendar": lambda rng: "/calendar",
+            "/edit/<day>": lambda rng: f"/edit/{(today - timedelta(days=rng.randrange(args.days))).isoformat()}",
+        }
+        print(f"{'waitress' if not args.use_async else 'uvicorn'} with {args.workers} workers, "
+              f"{args.concurrency} clients, {args.seconds}s per route")
+        for route, make_url in routes.items():
+            deadline = time.perf_counter() + args.seconds
+            samples = []
+
+            def client(seed):
+                rng = random.Random(seed)
+                conn = http.client.HTTPConnection("127.0.0.1", port)
+                while time.perf_counter() < deadline:
+                    t0 = time.perf_counter()
+                    conn.request("GET", make_url(rng), headers={"Cookie": cookie})
+                    conn.getresponse().read()
+                    samples.append(time.perf_counter() - t0)
+                conn.close()
+
+            threads = [threading.Thread(target=client, args=(n,)) for n in range(args.concurrency)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            ms = [x * 1000 for x in samples]
+            print(f"  {route:<12} {len(samples) / args.seconds:8.0f} req/s  "
+                  f"p50={percentile(ms, 50):.1f}ms  p99={percentile(ms, 99):.1f}ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# === suite: every route on a synthetic database, results saved for comparison ===
+
+def generate(users, years, items, seed):
+    """users x years of daily history, `items` random catalog foods per day.
+
+    Users are bench1..benchN (no password); the same arguments and seed give
+    the same data, ending today.
+    """
+    rng = random.Random(seed)
+    span = round(365.25 * years)
+    first_day = date.today() - timedelta(days=span - 1)
+    with iron.write_db() as db:
+        foods = db.execute(
+            "SELECT name, iron_per_100g FROM products WHERE iron_per_100g IS NOT NULL ORDER BY name"
+        ).fetchall()
+        for user_id in range(1, users + 1):
+            db.execute("INSERT INTO users (id, username) VALUES (?, ?)", (user_id, f"bench{user_id}"))
+            db.execute("INSERT INTO user_norms (user_id, effective_from, norm) VALUES (?, ?, ?)",
+                       (user_id, iron.NORM_EPOCH, iron.DEFAULT_NORM))
+            days = []
+            for n in range(span):
+                day_items = []
+                for name, per_100g in rng.choices(foods, k=items):
+                    grams = float(rng.randint(20, 300))
+                    day_items.append({"product": name, "grams": grams, "iron": round(per_100g * grams / 100, 2)})
+                days.append(((first_day + timedelta(days=n)).isoformat(), *iron.day_totals(day_items, iron.DEFAULT_NORM),
+                             day_items))
+            if not iron.storage.persistent:
+                iron.storage.put_days(user_id, [(d, day_items, iron.DEFAULT_NORM) for d, _, _, day_items in days])
+                continue
+            for start in range(0, span, iron.IMPORT_BATCH_DAYS):
+                iron.save_days(db, user_id, days[start:start + iron.IMPORT_BATCH_DAYS])
+            iron.refresh_rollups(db, user_id, first_day.isoformat())
+    return first_day, span
+
+
+def suite_routes(first_day, span):
+    """(name, method, request(rng) -> (url, test client kwargs, *untimed requests first)) for every route.
+
+    Untimed requests are (method, url, kwargs).
+    """
+    def day(rng):
+        return (first_day + timedelta(days=rng.randrange(span))).isoformat()
+
+    def month(rng):
+        d = date.fromisoformat(day(rng))
+        return f"year={d.year}&month={d.month}"
+
+    def items(rng):
+        return [{"product": rng.choice(list(iron.IRON_DATA)), "grams": rng.randint(20, 300)}
+                for _ in range(rng.randint(1, 5))]
+
+    def edit_form(rng):
+        form = {"norm": "15"}
+        for i, item in enumerate(items(rng)):
+            form[f"product_{i}"] = item["product"]
+            form[f"grams_{i}"] = str(item["grams"])
+        return form
+
+    def heatmap_after_save(rng):
+        # the save (not timed) drops the cached heatmap of its year, so this rebuilds it
+        d = day(rng)
+        return f"/api/v1/heatmap?year={d[:4]}", {}, ("PUT", f"/api/v1/days/{d}", {"json": {"items": items(rng)}})
+
+    def import_csv(rng):
+        # a few days, each day's rows together as the importer requires
+        days = sorted({day(rng) for _ in range(rng.randint(1, 3))})
+        rows = "".join(f"{d},{item['product']},{item['grams']},\n" for d in days for item in items(rng))
+        return ("date,product,grams,iron_mg\n" + rows).encode()
+
+    return [
+        ("dashboard", "GET", lambda rng: ("/", {})),
+        ("dashboard?days=90", "GET", lambda rng: ("/?days=90", {})),
+        ("calendar", "GET", lambda rng: ("/calendar", {})),
+        ("calendar?month", "GET", lambda rng: (f"/calendar?{month(rng)}", {})),
+        ("year", "GET", lambda rng: ("/year", {})),
+        ("year?year", "GET", lambda rng: (f"/year?year={day(rng)[:4]}", {})),
+        ("edit GET", "GET", lambda rng: (f"/edit/{day(rng)}", {})),
+        ("edit POST", "POST", lambda rng: (f"/edit/{day(rng)}", {"data": edit_form(rng)})),
+        ("export.csv", "GET", lambda rng: ("/export.csv", {})),
+        ("export.ndjson", "GET", lambda rng: ("/export.ndjson", {})),
+        ("import", "POST", lambda rng: ("/import", {"data": import_csv(rng), "content_type": "text/csv"})),
+        ("login page", "GET", lambda rng: ("/login", {})),
+        ("stats/pool", "GET", lambda rng: ("/stats/pool", {})),
+        ("stats/cache", "GET", lambda rng: ("/stats/cache", {})),
+        ("api day GET", "GET", lambda rng: (f"/api/v1/days/{day(rng)}", {})),
+        ("api day PUT", "PUT", lambda rng: (f"/api/v1/days/{day(rng)}", {"json": {"items": items(rng)}})),
+        ("api days POST", "POST",
+         lambda rng: ("/api/v1/days", {"json": {"days": [{"date": day(rng), "items": items(rng)}]}})),
+        ("api range", "GET", lambda rng: (f"/api/v1/days?from={day(rng)}&items=1", {})),
+        ("api dashboard", "GET", lambda rng: ("/api/v1/dashboard?days=30", {})),
+        ("api trends/week", "GET", lambda rng: ("/api/v1/trends/week", {})),
+        ("api trends/month", "GET", lambda rng: ("/api/v1/trends/month", {})),
+        ("api foods", "GET", lambda rng: (f"/api/v1/foods?q={rng.choice(list(iron.IRON_DATA))[:3]}", {})),
+        ("api heatmap", "GET", lambda rng: (f"/api/v1/heatmap?year={day(rng)[:4]}", {})),
+        ("api analytics", "GET", lambda rng: (f"/api/v1/analytics?from={day(rng)}", {})),
+        ("api rolling", "GET", lambda rng: (f"/api/v1/analytics/rolling?window=7&from={day(rng)}", {})),
+        ("heatmap after save", "GET", heatmap_after_save),
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# routes that query the records tables directly (501 with memory storage)
+SQLITE_ONLY_ROUTES = {"export.csv", "export.ndjson", "import", "api trends/week", "api trends/month",
+                      "api analytics", "api rolling"}
+
+
+def bench_suite(args):
+    fresh = args.storage == "memory" or not (args.db and os.path.exists(args.db))
+    use_database(args.db or temp_database())
+    if args.storage == "memory":
+        iron.storage = MemoryStorage(iron.DEFAULT_NORM)
+    if fresh:
+        t0 = time.perf_counter()
+        first_day, span = generate(args.users, args.years, args.items, args.seed)
+        print(f"generated {args.users} users x {span} days x {args.items} items in {time.perf_counter() - t0:.1f}s")
+    else:
+        # reuse a database generated earlier with the same --db
+        with iron.write_db() as db:
+            first, last = db.execute("SELECT MIN(record_date), MAX(record_date) FROM records").fetchone()
+        first_day = date.fromisoformat(first)
+        span = (date.fromisoformat(last) - first_day).days + 1
+
+    rng = random.Random(args.seed)
+    clients = {}
+    results = {}
+    print(f"{'route':<18} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for name, method, make_request in suite_routes(first_day, span):
+        if args.storage == "memory" and name in SQLITE_ONLY_ROUTES:
+            continue
+        samples = []
+        errors = 0
+        for n in range(args.warmup + args.ops):
+            user_id = rng.randint(1, args.users)
+            client = clients.get(user_id) or clients.setdefault(user_id, client_for(user_id))
+            url, kwargs, *before = make_request(rng)
+            for before_method, before_url, before_kwargs in before:
+                client.open(before_url, method=before_method, **before_kwargs).get_data()
+            t0 = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            response.get_data()
+            if n >= args.warmup:
+                samples.append(time.perf_counter() - t0)
+                errors += response.status_code >= 400
+        ms = [s * 1000 for s in samples]
+        results[name] = {
+            "req_s": round(len(samples) / sum(samples), 1),
+            "p50_ms": round(percentile(ms, 50), 3),
+            "p90_ms": round(percentile(ms, 90), 3),
+            "p99_ms": round(percentile(ms, 99), 3),
+            "errors": errors,
+        }
+        r = results[name]
+        print(f"{name:<18} {r['req_s']:>8.0f} {r['p50_ms']:>8.2f} {r['p90_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+              + (f"  {errors} errors" if errors else ""))
+
+    run = {
+        "when": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "params": {k: getattr(args, k) for k in ("users", "years", "items", "ops", "warmup", "seed", "storage")},
+        "routes": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"saved to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            before = json.load(f)
+        if before["params"] != run["params"]:
+            print(f"note: {args.compare} was run with {before['params']}")
+        print(f"\nvs {args.compare} ({before['revision']}, {before['when']}): change in p50 / p99")
+        for name, r in results.items():
+            old = before["routes"].get(name)
+            if old:
+                print(f"  {name:<18} {(r['p50_ms'] / old['p50_ms'] - 1) * 100:+7.1f}% "
+                      f"{(r['p99_ms'] / old['p99_ms'] - 1) * 100:+7.1f}%")
+
+
+# === startup: cold start of a fresh worker process ===
+
+STARTUP_CHILD = """
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+ready = time.perf_counter()
+response = application.test_client().get("/login")
+response.get_data()
+assert response.status_code == 200, response.status_code
+print(imported - started, ready - imported, time.perf_counter() - ready)
+"""
+
+
+def bench_startup(args):
+    """New interpreter -> import app -> create_app() -> first response, on a
+    new database file, on one whose schema already exists and on one that
+    also holds --rows records (startup work that grows with the data shows
+    up only there)."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'database':<10} {'import':>9} {'create_app':>11} {'1st request':>12} {'process':>9}   (medians, ms)")
+    for label in ("new", "existing", "filled"):
+        path = temp_database()
+        if label != "new":
+            subprocess.run([sys.executable, "-c", STARTUP_CHILD], cwd=root, check=True, stdout=subprocess.DEVNULL,
+                           env=child_env(path))
+        if label == "filled":
+            # already-migrated rows (items in record_items), as after the backfill
+            db = sqlite3.connect(path)
+            db.executemany(
+                "INSERT INTO records (user_id, record_date, total_iron, percentage, items_json) VALUES (?, ?, ?, ?, NULL)",
+                ((n % args.users + 1, (date(2000, 1, 1) + timedelta(days=n // args.users)).isoformat(), 10.0, 66.67)
+                 for n in range(args.rows))
+            )
+            db.commit()
+            db.close()
+        runs = []
+        for _ in range(args.runs):
+            if label == "new":
+                path = temp_database()
+            t0 = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", STARTUP_CHILD], cwd=root, check=True, capture_output=True,
+                                 text=True, env=child_env(path)).stdout
+            runs.append([float(x) * 1000 for x in out.split()] + [(time.perf_counter() - t0) * 1000])
+        medians = [percentile(column, 50) for column in zip(*runs)]
+        print(f"{label:<10} {medians[0]:>9.1f} {medians[1]:>11.1f} {medians[2]:>12.1f} {medians[3]:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("records", help="save/lookup latency as the records table grows")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--users", type=int, default=100)
+    p.add_argument("--ops", type=int, default=500)
+    p.set_defaults(func=bench_records)
+
+    p = sub.add_parser("load", help="throughput under concurrent saves and reads")
+    p.add_argument("--threads", type=int, default=8)
+    p.add_argument("--seconds", type=float, default=10)
+    p.add_argument("--days", type=int, default=365)
+    p.add_argument("--write-ratio", type=float, default=0.2)
+    p.add_argument("--group-commit", action="store_true", help="save through db.WriteQueue")
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser("render", help="edit page render time, template string vs cached template")
+    p.add_argument("-n", type=int, default=2000)
+    p.set_defaults(func=bench_render)
+
+    p = sub.add_parser("users", help="per-user page latency as the number of users grows")
+    p.add_argument("--users", type=int, default=10_000)
+    p.add_argument("--days", type=int, default=60)
+    p.add_argument("--ops", type=int, default=200)
+    p.set_defaults(func=bench_users)
+
+    p = sub.add_parser("io", help="streaming CSV import/export time and peak memory")
+    p.add_argument("--days", type=int, default=100_000)
+    p.add_argument("--items", type=int, default=3, choices=(1, 2, 3))
+    p.set_defaults(func=bench_io)
+
+    p = sub.add_parser("form", help="parse and save time of edit submissions with many items")
+    p.add_argument("--items", type=int, nargs="+", default=[10, 100, 500])
+    p.add_argument("-n", type=int, default=500)
+    p.set_defaults(func=bench_form)
+
+    p = sub.add_parser("bytes", help="bytes per page view: inline/uncompressed vs static files + compression")
+    p.set_defaults(func=bench_bytes)
+
+    p = sub.add_parser("http", help="req/s and latency of serve.py for /, /calendar and /edit/<day>")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--seconds", type=float, default=10)
+    p.add_argument("--workers", type=int, default=8, help="--threads, or --db-workers with --async")
+    p.add_argument("--days", type=int, default=365)
+    p.add_argument("--async", dest="use_async", action="store_true")
+    p.set_defaults(func=bench_http)
+
+    p = sub.add_parser("suite", help="every route on a synthetic database; save and compare runs")
+    p.add_argument("--users", type=int, default=10)
+    p.add_argument("--years", type=float, default=2)
+    p.add_argument("--items", type=int, default=3, help="foods per day")
+    p.add_argument("--ops", type=int, default=200, help="requests per route")
+    p.add_argument("--warmup", type=int, default=20, help="unmeasured requests per route first")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--db", help="generate into this file, or reuse it if it exists")
+    p.add_argument("--storage", choices=("sqlite", "memory"), default="sqlite",
+                   help="where days live (memory: storage.MemoryStorage; users stay in SQLite)")
+    p.add_argument("--save", metavar="JSON", help="write the results here")
+    p.add_argument("--compare", metavar="JSON", help="print the change against an earlier --save")
+    p.set_defaults(func=bench_suite)
+
+    p = sub.add_parser("startup", help="cold start time: import, create_app() and first request in a new process")
+    p.add_argument("--runs", type=int, default=10)
+    p.add_argument("--rows", type=int, default=500_000, help="records in the 'filled' database")
+    p.add_argument("--users", type=int, default=100)
+    p.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
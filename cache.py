@@ -0,0 +1,213 @@
+# cache.py
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """Per-user cached values, dropped as soon as the user's data changes.
+
+    Readers take generation(user_id) before reading the database and pass it
+    to put(); a put() for a user that has been invalidated since is ignored,
+    so a read racing a write can't cache pre-write data. Call invalidate()
+    after the write commits. Only this process's writes invalidate, so ttl
+    bounds how stale a value can get when other processes write; ttl=None
+    keeps values until they're invalidated or evicted. max_entries caps the
+    values of all users together; least recently used users go first.
+    """
+
+    def __init__(self, ttl, max_users=10_000, max_per_user=32, max_entries=None):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.max_per_user = max_per_user
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._users = OrderedDict()      # user_id -> {key: (expires, value)}
+        self._entries = 0
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, user_id):
+        return self._generations.get(user_id, 0)
+
+    def get(self, user_id, key):
+        with self._lock:
+            entry = self._users.get(user_id, {}).get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._users.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user_id, key, value, generation):
+        if self.ttl is not None and self.ttl <= 0:
+            return
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                return
+            values = self._users.setdefault(user_id, {})
+            expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+            if values.pop(key, None) is None:
+                self._entries += 1
+            values[key] = (expires, value)
+            if len(values) > self.max_per_user:
+                del values[next(iter(values))]
+                self._entries -= 1
+            self._users.move_to_end(user_id)
+            while len(self._users) > 1 and (len(self._users) > self.max_users or
+                                            self.max_entries is not None and self._entries > self.max_entries):
+                self._entries -= len(self._users.popitem(last=False)[1])
+            while self.max_entries is not None and self._entries > self.max_entries:
+                del values[next(iter(values))]
+                self._entries -= 1
+
+    def invalidate(self, user_id, match=None):
+        """Drop the user's values, or only those whose key satisfies match(key)."""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if match is None:
+                self._entries -= len(self._users.pop(user_id, ()))
+                return
+            values = self._users.get(user_id, {})
+            for key in [key for key in values if match(key)]:
+                del values[key]
+                self._entries -= 1
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._entries = 0
+            self._generations.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self._users), "entries": self._entries, "hits": self.hits, "misses": self.misses}
+
+
+class PageCache:
+    """Rendered response bodies by key: an LRU in memory, optionally backed
+    by a table in a separate SQLite file so entries survive restarts.
+
+    Keys must change whenever the content would (route, parameters, the
+    user's data version, the code); invalidate_user() then only frees the
+    space of entries that can no longer be hit. Both levels are bounded by
+    entry count and total body bytes; bodies over max_entry_bytes aren't kept.
+    """
+
+    def __init__(self, max_entries=512, path=None, max_disk_entries=50_000, max_bytes=64 << 20,
+                 max_entry_bytes=1 << 20, max_disk_bytes=512 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # key -> (user_id, body, mimetype)
+        self._bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._disk = None
+        self._puts = 0
+        self._disk_added = 0     # bytes written since the table was last trimmed
+        if path:
+            self._disk = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._disk.execute("PRAGMA journal_mode = WAL")
+            self._disk.execute("PRAGMA synchronous = OFF")   # a lost entry is just re-rendered
+            self._disk.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    key TEXT PRIMARY KEY, user_id INTEGER, body BLOB, mimetype TEXT, used REAL
+                )
+                """
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS idx_pages_user ON pages (user_id)")
+            self._disk.execute("CREATE INDEX IF NOT EXISTS idx_pages_used ON pages (used)")
+
+    def get(self, key):
+        """(body, mimetype) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1:]
+            if self._disk is not None:
+                row = self._disk.execute("SELECT user_id, body, mimetype FROM pages WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._disk.execute("UPDATE pages SET used = ? WHERE key = ?", (time.time(), key))
+                    self._remember(key, row)
+                    self.disk_hits += 1
+                    return row[1:]
+            self.misses += 1
+            return None
+
+    def put(self, key, user_id, body, mimetype):
+        if self.max_entries <= 0 or len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            self._remember(key, (user_id, body, mimetype))
+            if self._disk is not None:
+                self._disk.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                                   (key, user_id, body, mimetype, time.time()))
+                self._puts += 1
+                self._disk_added += len(body)
+                if self._puts % 1000 == 0 or self._disk_added >= self.max_disk_bytes // 16:
+                    self._trim_disk()
+
+    def _trim_disk(self):
+        # drop the least recently used rows beyond either limit
+        self._disk.execute(
+            """
+            DELETE FROM pages WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, ROW_NUMBER() OVER w AS n, SUM(LENGTH(body)) OVER w AS total
+                    FROM pages WINDOW w AS (ORDER BY used DESC)
+                ) WHERE n > ? OR total > ?
+            )
+            """,
+            (self.max_disk_entries, self.max_disk_bytes)
+        )
+        self._disk_added = 0
+
+    def _remember(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[1])
+        self._entries[key] = entry
+        self._bytes += len(entry[1])
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted[1])
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0] == user_id]:
+                self._bytes -= len(self._entries.pop(key)[1])
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM pages WHERE user_id = ?", (user_id,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM pages")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else None,
+                "disk_entries": self._disk.execute("SELECT COUNT(*) FROM pages").fetchone()[0] if self._disk else None,
+            }
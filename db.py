@@ -0,0 +1,223 @@
+# db.py
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Applied to every connection the pool opens
+PRAGMAS = {
+    "journal_mode": "WAL",      # readers don't block the writer and vice versa
+    "synchronous": "NORMAL",    # safe with WAL, fsync only at checkpoints
+    "cache_size": -16000,       # 16 MB page cache per connection
+    "mmap_size": 64 * 1024 * 1024,
+    "busy_timeout": 5000,       # ms; other processes may hold the write lock
+    "temp_store": "MEMORY",
+}
+
+
+class _ThreadConnections:
+    """Connections owned by one thread; closed when the thread goes away."""
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+
+    def close(self):
+        for conn in (self.reader, self.writer):
+            if conn is not None:
+                conn.close()
+        self.reader = self.writer = None
+
+
+class ConnectionPool:
+    """Per-thread SQLite connections with a read/write split.
+
+    Each thread reuses one read-only connection and, once it writes, one
+    write connection. SQLite has a single writer per database, so writes from
+    this process are serialized on a lock rather than left to fail with
+    "database is locked"; in WAL mode reads never wait for them.
+    """
+
+    def __init__(self, path, pragmas=None):
+        self.path = path
+        self.pragmas = dict(PRAGMAS, **(pragmas or {}))
+        self._local = threading.local()
+        self._threads = weakref.WeakSet()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._opened = 0
+        self._reused = 0
+        self._writes = 0
+        self._write_wait = 0.0
+        self._write_wait_max = 0.0
+
+    def _connect(self, readonly):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        with self._stats_lock:
+            self._opened += 1
+        return conn
+
+    def _thread_connections(self):
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = _ThreadConnections()
+            self._threads.add(conns)
+        return conns
+
+    def reader(self):
+        conns = self._thread_connections()
+        if conns.reader is None:
+            conns.reader = self._connect(readonly=True)
+        else:
+            with self._stats_lock:
+                self._reused += 1
+        return conns.reader
+
+    @contextmanager
+    def writer(self):
+        """Hold the write lock; commit on success, roll back on error."""
+        conns = self._thread_connections()
+        if conns.writer is None:
+            conns.writer = self._connect(readonly=False)
+        else:
+            with self._stats_lock:
+                self._reused += 1
+        conn = conns.writer
+
+        started = time.perf_counter()
+        with self._write_lock:
+            waited = time.perf_counter() - started
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        with self._stats_lock:
+            self._writes += 1
+            self._write_wait += waited
+            self._write_wait_max = max(self._write_wait_max, waited)
+
+    def release(self):
+        """End anything a request left open on this thread's connections."""
+        conns = getattr(self._local, "conns", None)
+        if conns is not None and conns.reader is not None and conns.reader.in_transaction:
+            conns.reader.rollback()
+
+    def close_all(self):
+        for conns in list(self._threads):
+            conns.close()
+
+    def stats(self):
+        with self._stats_lock:
+            threads = list(self._threads)
+            return {
+                "path": self.path,
+                "threads": len(threads),
+                "open_connections": sum((c.reader is not None) + (c.writer is not None) for c in threads),
+                "opened": self._opened,
+                "reused": self._reused,
+                "writes": self._writes,
+                "write_wait_ms_total": round(self._write_wait * 1000, 3),
+                "write_wait_ms_max": round(self._write_wait_max * 1000, 3),
+            }
+
+
+class WriteQueue:
+    """Group commit: writes from many threads share one transaction.
+
+    submit(fn) queues fn(conn) for a single writer thread, which takes
+    everything queued within max_delay of the first job (up to max_batch),
+    runs each job in its own savepoint and commits once. The returned
+    Future resolves after that commit, so a caller that waits on it reads
+    its own write afterwards. close() finishes everything already queued.
+    """
+
+    def __init__(self, pool, max_batch=64, max_delay=0.002, max_pending=1024):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._jobs = queue.Queue(max_pending)  # submit() blocks when this many are waiting
+        self._closed = False
+        self._close_lock = threading.Lock()   # no job can be queued behind close()'s sentinel
+        self._batches = 0
+        self._jobs_done = 0
+        self._thread = threading.Thread(target=self._run, name="iron-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn):
+        future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("write queue is closed")
+            self._jobs.put((fn, future))
+        return future
+
+    def close(self):
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            job = self._jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.perf_counter() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._jobs.get(timeout=max(0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with self.pool.writer() as conn:
+                conn.execute("BEGIN")
+                for fn, future in batch:
+                    conn.execute("SAVEPOINT job")
+                    try:
+                        result = fn(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO job")
+                        results.append((future, None, e))
+                    else:
+                        results.append((future, result, None))
+                    conn.execute("RELEASE job")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self._batches += 1
+        self._jobs_done += len(batch)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def stats(self):
+        return {
+            "batches": self._batches,
+            "jobs": self._jobs_done,
+            "pending": self._jobs.qsize(),
+        }
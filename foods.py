@@ -0,0 +1,76 @@
+# foods.py
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FoodIndex:
+    """In-memory search over the food catalog.
+
+    Prefix matches (on the whole name or any word in it) come from a sorted
+    key list and bisect; if those don't fill the page, names sharing enough
+    trigrams with the query are added, which tolerates typos and matches
+    inside words.
+    """
+
+    def __init__(self, rows):
+        # rows: (id, name, iron_per_100g)
+        self.foods = {name: (food_id, iron) for food_id, name, iron in rows}
+        self._by_lower = {name.lower(): name for name in self.foods}
+        keys = []
+        self._trigrams = defaultdict(list)
+        for name in self.foods:
+            lower = name.lower()
+            words = lower.split()
+            for i in range(len(words)):
+                keys.append((" ".join(words[i:]), name))
+            for gram in trigrams(lower):
+                self._trigrams[gram].append(name)
+        keys.sort()
+        self._keys = keys
+
+    def __len__(self):
+        return len(self.foods)
+
+    def iron(self, name):
+        """iron per 100 g, or None if the name isn't in the catalog."""
+        food = self.foods.get(name)
+        return food[1] if food else None
+
+    def lookup(self, name):
+        """Catalog spelling of name, ignoring case and surrounding spaces."""
+        return self._by_lower.get(name.strip().lower())
+
+    def search(self, query, limit=20):
+        query = " ".join(query.lower().split())
+        if not query:
+            return []
+        found = []
+        seen = set()
+
+        i = bisect_left(self._keys, (query,))
+        while i < len(self._keys) and len(found) < limit:
+            key, name = self._keys[i]
+            if not key.startswith(query):
+                break
+            if name not in seen:
+                seen.add(name)
+                found.append(name)
+            i += 1
+
+        if len(found) < limit and len(query) >= 3:
+            grams = trigrams(query)
+            counts = Counter(name for gram in grams for name in self._trigrams.get(gram, ()))
+            needed = max(2, len(grams) // 2)
+            for name, shared in counts.most_common():
+                if shared < needed or len(found) >= limit:
+                    break
+                if name not in seen:
+                    seen.add(name)
+                    found.append(name)
+
+        return [(name, *self.foods[name]) for name in found]
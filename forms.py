@@ -0,0 +1,114 @@
+# forms.py
+import math
+from itertools import zip_longest
+
+# Items accepted for one day
+MAX_ITEMS = 500
+
+
+class FormErrors(ValueError):
+    """Invalid input; errors is a list of {"field", "message"}, one per problem."""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(f"{e['field']}: {e['message']}" for e in errors))
+        self.errors = errors
+
+
+def form_rows(form):
+    """(field name pattern, product, grams) for each item row of an edit form.
+
+    Takes repeated product/grams fields, paired by position, and numbered
+    product_N/grams_N fields in order of N; gaps in the numbering (a row
+    removed without renumbering the rest) don't lose anything after them.
+    """
+    rows = [(f"{{}}[{n}]", product, grams)
+            for n, (product, grams) in enumerate(zip_longest(form.getlist("product"), form.getlist("grams")))]
+    numbered = {}
+    for key, value in form.items():
+        if key.startswith("product_"):
+            slot, index = 0, key[8:]
+        elif key.startswith("grams_"):
+            slot, index = 1, key[6:]
+        else:
+            continue
+        if index.isdigit():
+            numbered.setdefault(int(index), [None, None])[slot] = value
+    rows.extend((f"{{}}_{index}", *numbered[index]) for index in sorted(numbered))
+    return rows
+
+
+def json_rows(raw):
+    """Same as form_rows for a JSON list of {"product", "grams"}."""
+    if not isinstance(raw, list):
+        raise FormErrors([{"field": "items", "message": "must be a list"}])
+    bad = [{"field": f"items[{n}]", "message": "must be an object"}
+           for n, entry in enumerate(raw) if not isinstance(entry, dict)]
+    if bad:
+        raise FormErrors(bad)
+    return [(f"items[{n}].{{}}", entry.get("product"), entry.get("grams")) for n, entry in enumerate(raw)]
+
+
+def parse_amount(value):
+    """float(value) if it is a finite number >= 0 (not a bool), else None."""
+    if value.__class__ is bool:
+        return None
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if 0 <= amount < math.inf else None
+
+
+def parse_items(rows, foods):
+    """Items [{"product", "grams", "iron"}] from (field, product, grams) rows.
+
+    Product names are matched to the catalog's spelling (names it doesn't
+    know are errors) and iron is worked out from the unrounded grams. Rows
+    with neither a product nor grams are skipped. Every problem found is
+    reported in one FormErrors.
+    """
+    if len(rows) > MAX_ITEMS:
+        raise FormErrors([{"field": "items", "message": f"at most {MAX_ITEMS} items per day"}])
+    catalog = foods.foods
+    items = []
+    errors = []
+    for field, product, grams in rows:
+        if product.__class__ is str:
+            product = product.strip()
+        if not product and (grams is None or grams == ""):
+            continue
+        amount = parse_amount(grams)
+        if not product or product.__class__ is not str:
+            errors.append({"field": field.format("product"), "message": "enter a product"})
+        else:
+            # exact catalog spelling first; lookup() lowercases
+            food = catalog.get(product)
+            if food is None:
+                product = foods.lookup(product) or product
+                food = catalog.get(product)
+                if food is None:
+                    errors.append({"field": field.format("product"), "message": "unknown food"})
+        if amount is None:
+            errors.append({"field": field.format("grams"), "message": "grams must be a number, 0 or more"})
+        if errors:
+            continue
+        iron = round(((food[1] or 0) / 100) * amount, 2)
+        items.append({"product": product, "grams": round(amount, 2), "iron": iron})
+    if errors:
+        raise FormErrors(errors)
+    return items
+
+
+def parse_day(norm, rows, foods):
+    """(norm, items) for one day; FormErrors lists every invalid field."""
+    errors = []
+    norm = parse_amount(norm)
+    if not norm:
+        errors.append({"field": "norm", "message": "the daily limit must be a number above 0"})
+    try:
+        items = parse_items(rows, foods)
+    except FormErrors as e:
+        errors.extend(e.errors)
+    if errors:
+        raise FormErrors(errors)
+    return norm, items
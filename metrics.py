@@ -0,0 +1,197 @@
+# metrics.py
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request, has_request_context, before_render_template, template_rendered
+
+# Upper bounds (ms) of the latency histogram buckets; the last one catches the rest
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+
+
+class _RequestStats:
+    __slots__ = ("started", "queries", "sql", "render", "render_started", "slowest_sql", "slowest")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.render = 0.0
+        self.render_started = None
+        self.slowest_sql = 0.0
+        self.slowest = None
+
+    def query(self, statement, elapsed):
+        self.queries += 1
+        self.sql += elapsed
+        if elapsed > self.slowest_sql:
+            self.slowest_sql = elapsed
+            self.slowest = " ".join(statement.split())[:200]
+
+
+class _TimedCursor:
+    """Adds the time spent stepping through rows to the statement's total."""
+
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def _timed(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self._stats.sql += time.perf_counter() - started
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(self._cursor.fetchmany, *(() if size is None else (size,)))
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._timed(self._cursor.__next__)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _TimedConnection:
+    """Connection wrapper counting and timing statements for the current request."""
+
+    def __init__(self, conn, stats):
+        self._conn = conn
+        self._stats = stats
+
+    def _run(self, method, sql, *args):
+        started = time.perf_counter()
+        try:
+            cursor = method(sql, *args)
+        finally:
+            self._stats.query(sql, time.perf_counter() - started)
+        return _TimedCursor(cursor, self._stats)
+
+    def execute(self, sql, *args):
+        return self._run(self._conn.execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._run(self._conn.executemany, sql, *args)
+
+    def executescript(self, sql):
+        return self._run(self._conn.executescript, sql)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class Metrics:
+    """Per-endpoint request timing, SQL counts and template render time.
+
+    Off unless enabled; then install() hooks the app and connection() wraps
+    connections handed out during a request. Requests slower than slow_ms
+    (if set) are logged with their query count and slowest statement.
+    """
+
+    def __init__(self, enabled=False, slow_ms=None):
+        self.slow_ms = slow_ms
+        self.enabled = enabled or slow_ms is not None
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def install(self, app):
+        if not self.enabled:
+            return
+        self._logger = app.logger
+        # registered before the app's own hooks, so login redirects are timed too
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+        before_render_template.connect(self._render_start, app)
+        template_rendered.connect(self._render_end, app)
+
+    def connection(self, conn):
+        if not self.enabled or not has_request_context():
+            return conn
+        stats = g.get("_metrics")
+        return conn if stats is None else _TimedConnection(conn, stats)
+
+    def _start(self):
+        g._metrics = _RequestStats()
+
+    def _render_start(self, sender, **extra):
+        stats = g.get("_metrics")
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+
+    def _render_end(self, sender, **extra):
+        stats = g.get("_metrics")
+        if stats is not None and stats.render_started is not None:
+            stats.render += time.perf_counter() - stats.render_started
+            stats.render_started = None
+
+    def _finish(self, exception):
+        # for streamed responses (exports) this is time to the first byte
+        stats = g.pop("_metrics", None)
+        if stats is None:
+            return
+        elapsed = (time.perf_counter() - stats.started) * 1000
+        endpoint = request.endpoint or "<unmatched>"
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {
+                    "count": 0, "errors": 0, "ms_total": 0.0, "ms_max": 0.0, "queries": 0,
+                    "sql_ms": 0.0, "render_ms": 0.0, "buckets": [0] * len(BUCKETS_MS),
+                }
+            entry["count"] += 1
+            entry["errors"] += exception is not None
+            entry["ms_total"] += elapsed
+            entry["ms_max"] = max(entry["ms_max"], elapsed)
+            entry["queries"] += stats.queries
+            entry["sql_ms"] += stats.sql * 1000
+            entry["render_ms"] += stats.render * 1000
+            entry["buckets"][bisect_left(BUCKETS_MS, elapsed)] += 1
+        if self.slow_ms is not None and elapsed >= self.slow_ms:
+            self._logger.warning(
+                "slow request %s %s: %.1f ms, %d queries (%.1f ms), render %.1f ms; slowest: %s (%.1f ms)",
+                request.method, request.full_path.rstrip("?"), elapsed, stats.queries, stats.sql * 1000,
+                stats.render * 1000, stats.slowest, stats.slowest_sql * 1000)
+
+    def snapshot(self):
+        """Totals per endpoint, with latency percentiles estimated from the histogram."""
+        with self._lock:
+            endpoints = {name: dict(entry, buckets=list(entry["buckets"])) for name, entry in self._endpoints.items()}
+        result = {}
+        for name, entry in sorted(endpoints.items()):
+            count = entry["count"]
+            result[name] = {
+                "count": count,
+                "errors": entry["errors"],
+                "ms_avg": round(entry["ms_total"] / count, 3),
+                "ms_max": round(entry["ms_max"], 3),
+                "ms_p50": _bucket_percentile(entry["buckets"], count, 50),
+                "ms_p99": _bucket_percentile(entry["buckets"], count, 99),
+                "queries_avg": round(entry["queries"] / count, 2),
+                "sql_ms_avg": round(entry["sql_ms"] / count, 3),
+                "render_ms_avg": round(entry["render_ms"] / count, 3),
+                # [upper bound, count] pairs, in order
+                "histogram_ms": [["+Inf" if bound == float("inf") else bound, n]
+                                 for bound, n in zip(BUCKETS_MS, entry["buckets"])],
+            }
+        return result
+
+
+def _bucket_percentile(buckets, count, pct):
+    # upper bound of the bucket holding the pct-th request (None if it's the overflow bucket)
+    rank = count * pct / 100
+    seen = 0
+    for bound, n in zip(BUCKETS_MS, buckets):
+        seen += n
+        if seen >= rank:
+            return None if bound == float("inf") else bound
+    return None
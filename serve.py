@@ -0,0 +1,53 @@
+# serve.py
+"""Production entry point (`python app.py` is the debug server).
+
+    python serve.py --threads 8 --port 8000
+    python serve.py --async --db-workers 8
+
+The default runs waitress with a fixed number of worker threads. --async
+runs an asyncio server (uvicorn) that handles connections on the event loop
+and runs the app, and with it all SQLite work, on a bounded thread pool of
+--db-workers threads; it needs `pip install uvicorn a2wsgi`.
+"""
+import argparse
+import os
+
+from app import create_app
+
+
+def main(argv=None):
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=env("IRON_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(env("IRON_PORT", "8000")))
+    parser.add_argument("--threads", type=int, default=int(env("IRON_THREADS", "8")),
+                        help="waitress worker threads")
+    parser.add_argument("--connection-limit", type=int, default=int(env("IRON_CONNECTION_LIMIT", "200")),
+                        help="waitress: open connections before new ones wait")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="serve with uvicorn, running requests on a bounded executor")
+    parser.add_argument("--db-workers", type=int, default=int(env("IRON_DB_WORKERS", "8")),
+                        help="--async: threads in the executor (and SQLite connection pairs)")
+    args = parser.parse_args(argv)
+
+    try:
+        app = create_app()
+    except RuntimeError as e:
+        parser.error(str(e))
+
+    if args.use_async:
+        try:
+            import uvicorn
+            from a2wsgi import WSGIMiddleware
+        except ImportError:
+            parser.error("--async needs uvicorn and a2wsgi: pip install uvicorn a2wsgi")
+        uvicorn.run(WSGIMiddleware(app, workers=args.db_workers),
+                    host=args.host, port=args.port, log_level="warning")
+    else:
+        from waitress import serve
+        serve(app, host=args.host, port=args.port,
+              threads=args.threads, connection_limit=args.connection_limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+// edit.js
+// Поля product/grams повторяются: сервер сопоставляет их по порядку
+function addProduct() {
+    const div = document.createElement("div");
+    div.className = "product-row";
+    div.innerHTML = `
+        <input type="text" class="product-input" name="product"
+               list="food-suggestions" placeholder="Start typing a food" autocomplete="off" required>
+        <input type="number" name="grams" placeholder="Grams" required>
+        <input type="text" readonly value=" mg">
+        <button type="button" class="remove-button" onclick="removeProduct(this)">🗑 Delete</button>
+    `;
+    document.getElementById("products").appendChild(div);
+}
+
+// Каталог не встраивается в страницу: подсказки запрашиваются по мере ввода
+let suggestTimer = null;
+let lastQuery = "";
+document.getElementById("products").addEventListener("input", (event) => {
+    if (!event.target.classList.contains("product-input")) return;
+    const query = event.target.value.trim();
+    clearTimeout(suggestTimer);
+    if (!query || query === lastQuery) return;
+    suggestTimer = setTimeout(async () => {
+        lastQuery = query;
+        const response = await fetch(`/api/v1/foods?q=${encodeURIComponent(query)}`);
+        if (!response.ok) return;
+        const list = document.getElementById("food-suggestions");
+        list.replaceChildren(...(await response.json()).map((food) => {
+            const option = document.createElement("option");
+            option.value = food.name;
+            option.label = `${food.iron_per_100g} mg / 100 g`;
+            return option;
+        }));
+    }, 150);
+});
+
+function removeProduct(button) {
+    button.closest(".product-row").remove();
+}
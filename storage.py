@@ -0,0 +1,175 @@
+# storage.py
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple
+
+class Day(NamedTuple):
+    record_date: str
+    total_iron: float
+    percentage: float
+    items: list = None     # [{"product", "grams", "iron"}], None if not loaded
+
+
+def day_totals(items, norm):
+    total = round(sum(item["iron"] for item in items), 2)
+    return total, round((total / norm) * 100, 2)
+
+
+class Storage(ABC):
+    """Where users' days live. Dates are ISO strings, except in recent().
+
+    put_days() saves [(record_date, items, norm)] atomically and returns
+    (total, percentage, changed) per day, changed being the span of days
+    whose stored values changed as (first, end), end exclusive or None:
+    a new norm applies from its day until the next change.
+    """
+
+    # whether saved days outlive the process
+    persistent = False
+
+    def snapshot(self):
+        """Make the reads until the end of the request see one consistent state."""
+
+    @abstractmethod
+    def get_day(self, user_id, record_date, items=True):
+        """The Day, with its items unless items=False; None if not recorded."""
+
+    @abstractmethod
+    def get_range(self, user_id, start, end, items=False):
+        """Recorded days from start to end inclusive, oldest first."""
+
+    @abstractmethod
+    def put_days(self, user_id, days):
+        """Save [(record_date, items, norm)]; see the class docstring."""
+
+    def put_day(self, user_id, record_date, items, norm):
+        return self.put_days(user_id, [(record_date, items, norm)])[0]
+
+    @abstractmethod
+    def norm_on(self, user_id, record_date):
+        """The user's daily limit on record_date."""
+
+    @abstractmethod
+    def version(self, user_id):
+        """(version, last modified) of the user's days; (0, None) if never written."""
+
+    def recent(self, user_id, end_day, days):
+        """(date, Day or None) for the `days` days ending at end_day, newest first."""
+        start_day = end_day - timedelta(days=days - 1)
+        found = {day.record_date: day for day in self.get_range(user_id, start_day.isoformat(), end_day.isoformat())}
+        days_desc = (end_day - timedelta(days=offset) for offset in range(days))
+        return [(day, found.get(day.isoformat())) for day in days_desc]
+
+
+class _UserDays:
+    """One user's days in parallel arrays sorted by date (as ordinals)."""
+
+    __slots__ = ("ordinals", "totals", "percentages", "items", "norm_from", "norms", "version", "updated_at")
+
+    def __init__(self, default_norm):
+        self.ordinals = array("l")
+        self.totals = array("d")
+        self.percentages = array("d")
+        self.items = []
+        self.norm_from = [date.min.toordinal()]
+        self.norms = [default_norm]
+        self.version = 0
+        self.updated_at = None
+
+    def norm_at(self, ordinal):
+        return self.norms[bisect_right(self.norm_from, ordinal) - 1]
+
+    def set_norm(self, ordinal, norm):
+        """Use norm from ordinal until the next change; (ordinal, end ordinal or None), or None if unchanged."""
+        if self.norm_at(ordinal) == norm:
+            return None
+        i = bisect_left(self.norm_from, ordinal)
+        if i < len(self.norm_from) and self.norm_from[i] == ordinal:
+            self.norms[i] = norm
+        else:
+            self.norm_from.insert(i, ordinal)
+            self.norms.insert(i, norm)
+        end = self.norm_from[i + 1] if i + 1 < len(self.norm_from) else None
+        first = bisect_left(self.ordinals, ordinal)
+        last = bisect_left(self.ordinals, end) if end is not None else len(self.ordinals)
+        for j in range(first, last):
+            self.percentages[j] = round(self.totals[j] / norm * 100, 2)
+        return ordinal, end
+
+    def put(self, ordinal, total, percentage, items):
+        i = bisect_left(self.ordinals, ordinal)
+        if i < len(self.ordinals) and self.ordinals[i] == ordinal:
+            self.totals[i] = total
+            self.percentages[i] = percentage
+            self.items[i] = items
+        else:
+            self.ordinals.insert(i, ordinal)
+            self.totals.insert(i, total)
+            self.percentages.insert(i, percentage)
+            self.items.insert(i, items)
+
+    def day(self, i, items):
+        return Day(date.fromordinal(self.ordinals[i]).isoformat(), self.totals[i], self.percentages[i],
+                   [dict(item) for item in self.items[i]] if items else None)
+
+
+class MemoryStorage(Storage):
+    """Days kept in process memory: sorted arrays per user, so a day or a
+    range is found by bisection in O(log n). Nothing is persisted; meant for
+    benchmarks and tests.
+    """
+
+    def __init__(self, default_norm):
+        self.default_norm = default_norm
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def _user(self, user_id):
+        days = self._users.get(user_id)
+        if days is None:
+            days = self._users[user_id] = _UserDays(self.default_norm)
+        return days
+
+    def get_day(self, user_id, record_date, items=True):
+        ordinal = date.fromisoformat(record_date).toordinal()
+        with self._lock:
+            days = self._user(user_id)
+            i = bisect_left(days.ordinals, ordinal)
+            if i < len(days.ordinals) and days.ordinals[i] == ordinal:
+                return days.day(i, items)
+        return None
+
+    def get_range(self, user_id, start, end, items=False):
+        with self._lock:
+            days = self._user(user_id)
+            first = bisect_left(days.ordinals, date.fromisoformat(start).toordinal())
+            last = bisect_right(days.ordinals, date.fromisoformat(end).toordinal())
+            return [days.day(i, items) for i in range(first, last)]
+
+    def put_days(self, user_id, entries):
+        results = []
+        with self._lock:
+            days = self._user(user_id)
+            for record_date, items, norm in entries:
+                ordinal = date.fromisoformat(record_date).toordinal()
+                total, percentage = day_totals(items, norm)
+                changed = days.set_norm(ordinal, norm)
+                days.put(ordinal, total, percentage, [dict(item) for item in items])
+                first, end = changed or (ordinal, ordinal + 1 if record_date != date.max.isoformat() else None)
+                results.append((total, percentage,
+                                (record_date, date.fromordinal(end).isoformat() if end is not None else None)))
+            days.version += 1
+            days.updated_at = datetime.now(timezone.utc).replace(microsecond=0)
+        return results
+
+    def norm_on(self, user_id, record_date):
+        with self._lock:
+            return self._user(user_id).norm_at(date.fromisoformat(record_date).toordinal())
+
+    def version(self, user_id):
+        with self._lock:
+            days = self._user(user_id)
+            return days.version, days.updated_at
@@ -0,0 +1,42 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+# app opens IRON_DB at import: point it away from the real iron.db first
+os.environ["IRON_DB"] = os.path.join(tempfile.mkdtemp(), "iron.db")
+for name in ("IRON_STORAGE", "IRON_GROUP_COMMIT", "IRON_PAGE_CACHE_DB"):
+    os.environ.pop(name, None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import app as iron
+from db import ConnectionPool
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Point the app at a new database file for one test."""
+    monkeypatch.setattr(iron, "DATABASE", str(tmp_path / "iron.db"))
+    monkeypatch.setattr(iron, "pool", ConnectionPool(iron.DATABASE))
+    monkeypatch.setattr(iron, "_food_index", (None, None))
+    for cache in (iron.dashboard_cache, iron.heatmap_cache, iron.page_cache):
+        cache.clear()
+    iron.ensure_schema()
+    yield iron.DATABASE
+    iron.pool.close_all()
+
+
+@pytest.fixture
+def login(database):
+    """login(username) -> test client with a session for a new user of that name."""
+    def login(username="alice"):
+        with iron.write_db() as db:
+            user_id = iron.create_user(db, username, "password")
+        client = iron.app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+        return client
+    return login
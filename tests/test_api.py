@@ -0,0 +1,50 @@
+# tests/test_api.py
+import pytest
+
+import app as iron
+from storage import MemoryStorage
+
+
+@pytest.mark.parametrize("norm", ["NaN", "Infinity", True, 0, -3, "lots", [15]])
+def test_bad_norm_is_a_400(login, norm):
+    client = login()
+    # json.dumps writes NaN/Infinity as bare tokens, which Flask's parser accepts
+    response = client.put("/api/v1/days/2024-01-01", json={"items": [], "norm": float(norm) if norm in ("NaN", "Infinity") else norm})
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == [{"field": "days[0].norm", "message": "the daily limit must be a number above 0"}]
+    assert client.get("/api/v1/days/2024-01-01").status_code == 404
+
+
+def test_bulk_save_reports_the_day_with_the_bad_norm(login):
+    client = login()
+    response = client.post("/api/v1/days", json={"days": [{"date": "2024-01-01", "items": [], "norm": 20},
+                                                          {"date": "2024-01-02", "items": [], "norm": float("nan")}]})
+    assert response.status_code == 400
+    assert response.get_json()["errors"][0]["field"] == "days[1].norm"
+    assert client.get("/api/v1/days?from=2024-01-01&to=2024-01-02").get_json()["days"] == []
+
+
+def test_norm_is_used(login):
+    client = login()
+    client.put("/api/v1/days/2024-01-01", json={"items": [{"product": "Spinach", "grams": 100}], "norm": "5.4"})
+    assert client.get("/api/v1/days/2024-01-01").get_json()["percentage"] == 50.0
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "memory"])
+def test_last_representable_day(login, monkeypatch, backend):
+    if backend == "memory":
+        monkeypatch.setattr(iron, "storage", MemoryStorage(iron.DEFAULT_NORM))
+    client = login()
+    heatmap = "/api/v1/heatmap?from=9999-12-01&to=9999-12-31"
+    assert client.get(heatmap).get_json()["days"] == {}
+    for norm in (15, 20):
+        response = client.put("/api/v1/days/9999-12-31", json={"items": [{"product": "Spinach", "grams": 100}], "norm": norm})
+        assert response.status_code == 200
+    response = client.post("/edit/9999-12-31", data={"norm": "27", "product": "Spinach", "grams": "100"})
+    assert response.status_code == 302
+    assert client.get("/api/v1/days/9999-12-31").get_json()["percentage"] == 10.0
+    assert client.get(heatmap).get_json()["days"] == {"9999-12-31": 10.0}
+    if backend == "sqlite":
+        week = client.get("/api/v1/trends/week?from=9999-12-27&to=9999-12-31").get_json()["points"]
+        month = client.get("/api/v1/trends/month?year=9999").get_json()["points"]
+        assert [(p["start"], p["days"]) for p in week + month] == [("9999-12-27", 1), ("9999-12-01", 1)]
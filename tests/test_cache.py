@@ -0,0 +1,28 @@
+# tests/test_cache.py
+from cache import UserCache
+
+
+def test_user_cache_max_entries_evicts_least_recent_users():
+    cache = UserCache(ttl=None, max_per_user=3, max_entries=4)
+    for user_id in (1, 2):
+        for key in ("a", "b"):
+            cache.put(user_id, key, key, 0)
+    cache.get(1, "a")
+    cache.put(3, "a", "a", 0)
+    assert cache.stats()["entries"] == 3
+    assert cache.get(2, "a") is None and cache.get(1, "b") == "b"
+    for key in ("b", "c", "d"):
+        cache.put(3, key, key, 0)
+    assert cache.stats()["entries"] == 3
+    assert [cache.get(3, key) for key in "abcd"] == [None, "b", "c", "d"]
+
+
+def test_user_cache_invalidate_keeps_the_count():
+    cache = UserCache(ttl=None, max_entries=10)
+    for key in range(5):
+        cache.put(1, key, key, 0)
+    cache.put(1, 0, "again", 0)
+    cache.invalidate(1, lambda key: key < 2)
+    assert cache.stats()["entries"] == 3
+    cache.invalidate(1)
+    assert cache.stats()["entries"] == 0
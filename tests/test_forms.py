@@ -0,0 +1,102 @@
+# tests/test_forms.py
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from foods import FoodIndex
+from forms import MAX_ITEMS, FormErrors, form_rows, json_rows, parse_amount, parse_day, parse_items
+
+FOODS = FoodIndex([(1, "Spinach", 2.7), (2, "Beef Liver", 6.5), (3, "Water", None)])
+
+
+def parse_form(pairs):
+    return parse_items(form_rows(MultiDict(pairs)), FOODS)
+
+
+def errors_of(call, *args):
+    with pytest.raises(FormErrors) as e:
+        call(*args)
+    return e.value.errors
+
+
+def test_gap_in_numbered_fields_keeps_later_rows():
+    items = parse_form([("product_0", "Spinach"), ("grams_0", "100"),
+                        ("product_2", "Beef Liver"), ("grams_2", "10")])
+    assert [item["product"] for item in items] == ["Spinach", "Beef Liver"]
+
+
+def test_numbered_fields_are_in_numeric_order():
+    rows = form_rows(MultiDict([("product_10", "b"), ("grams_10", "2"), ("product_9", "a"), ("grams_9", "1")]))
+    assert rows == [("{}_9", "a", "1"), ("{}_10", "b", "2")]
+
+
+def test_repeated_and_numbered_fields_together():
+    rows = form_rows(MultiDict([("product", "Spinach"), ("grams", "1"), ("product", "Water"), ("grams", "2"),
+                                ("product_0", "Beef Liver"), ("grams_0", "3"), ("product_x", "ignored")]))
+    assert rows == [("{}[0]", "Spinach", "1"), ("{}[1]", "Water", "2"), ("{}_0", "Beef Liver", "3")]
+    assert [item["grams"] for item in parse_items(rows, FOODS)] == [1.0, 2.0, 3.0]
+
+
+def test_blank_rows_are_skipped():
+    items = parse_form([("product", ""), ("grams", ""), ("product", "  "), ("grams", ""),
+                        ("product_1", "spinach "), ("grams_1", "100"), ("product_2", ""), ("grams_2", "")])
+    assert items == [{"product": "Spinach", "grams": 100.0, "iron": 2.7}]
+
+
+def test_unmatched_repeated_field_is_an_error():
+    assert errors_of(parse_form, [("product", "Spinach"), ("grams", "1"), ("grams", "2")]) == [
+        {"field": "product[1]", "message": "enter a product"}]
+
+
+def test_max_items():
+    rows = [("{}[%d]" % n, "Spinach", "1") for n in range(MAX_ITEMS)]
+    assert len(parse_items(rows, FOODS)) == MAX_ITEMS
+    assert errors_of(parse_items, rows + [("{}[x]", "Spinach", "1")], FOODS) == [
+        {"field": "items", "message": f"at most {MAX_ITEMS} items per day"}]
+
+
+def test_catalog_spelling_and_unknown_food():
+    assert parse_form([("product_0", "BEEF liver"), ("grams_0", "20")])[0] == {
+        "product": "Beef Liver", "grams": 20.0, "iron": 1.3}
+    assert parse_form([("product_0", "Water"), ("grams_0", "250")])[0]["iron"] == 0
+    assert errors_of(parse_form, [("product_0", "Spinch"), ("grams_0", "20")]) == [
+        {"field": "product_0", "message": "unknown food"}]
+
+
+@pytest.mark.parametrize("grams", ["nan", "NaN", "inf", "-1", "-0.5", "abc", True, False, None, [1]])
+def test_bad_grams(grams):
+    rows = json_rows([{"product": "Spinach", "grams": grams}])
+    assert errors_of(parse_items, rows, FOODS) == [
+        {"field": "items[0].grams", "message": "grams must be a number, 0 or more"}]
+
+
+@pytest.mark.parametrize("value, amount", [("0", 0.0), ("12.5", 12.5), (3, 3.0), (" 4 ", 4.0),
+                                           (True, None), ("nan", None), (float("inf"), None), ("-1", None)])
+def test_parse_amount(value, amount):
+    assert parse_amount(value) == amount
+
+
+def test_every_error_is_reported_with_its_field():
+    errors = errors_of(parse_day, "0", form_rows(MultiDict([
+        ("product", "Spinach"), ("grams", "-1"),
+        ("product", "Kale"), ("grams", "5"),
+        ("product_3", ""), ("grams_3", "5"),
+    ])), FOODS)
+    assert errors == [
+        {"field": "norm", "message": "the daily limit must be a number above 0"},
+        {"field": "grams[0]", "message": "grams must be a number, 0 or more"},
+        {"field": "product[1]", "message": "unknown food"},
+        {"field": "product_3", "message": "enter a product"},
+    ]
+    assert str(FormErrors(errors[:1])) == "norm: the daily limit must be a number above 0"
+
+
+def test_json_rows_rejects_non_objects():
+    assert errors_of(json_rows, {"product": "Spinach"}) == [{"field": "items", "message": "must be a list"}]
+    assert errors_of(json_rows, [{"product": "Spinach", "grams": 1}, "Spinach", 3]) == [
+        {"field": "items[1]", "message": "must be an object"}, {"field": "items[2]", "message": "must be an object"}]
+    assert errors_of(parse_items, json_rows([{"product": 5, "grams": 1}]), FOODS) == [
+        {"field": "items[0].product", "message": "enter a product"}]
+
+
+def test_parse_day():
+    assert parse_day("15", [("{}[0]", "Spinach", "50")], FOODS) == (15.0, [{"product": "Spinach", "grams": 50.0, "iron": 1.35}])
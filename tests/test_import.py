@@ -0,0 +1,103 @@
+# tests/test_import.py
+"""CSV/NDJSON import rules and export -> import round trips."""
+import json
+
+import pytest
+
+import app as iron
+
+CSV_HEADER = "date,product,grams,iron_mg\n"
+
+
+def import_file(client, body, fmt="csv"):
+    response = client.post(f"/import?format={fmt}", data=body.encode(),
+                           content_type="text/csv" if fmt == "csv" else "application/x-ndjson")
+    return response.status_code, response.get_json()
+
+
+def days(client, start="0001-01-01", end="9999-12-31"):
+    return client.get(f"/api/v1/days?from={start}&to={end}&items=1").get_json()["days"]
+
+
+def test_csv_import(login):
+    client = login()
+    status, body = import_file(client, CSV_HEADER + (
+        "2024-01-01,spinach,100,\n"
+        "2024-01-01,Family recipe,50,1.25\n"
+        "2024-01-02,,,\n"
+    ))
+    assert (status, body) == (200, {"imported": 2})
+    first, second = days(client)
+    assert first["items"] == [{"product": "Spinach", "grams": 100.0, "iron_mg": 2.7},
+                              {"product": "Family recipe", "grams": 50.0, "iron_mg": 1.25}]
+    assert (first["total_iron"], first["percentage"]) == (3.95, 26.33)
+    assert (second["date"], second["items"]) == ("2024-01-02", [])
+
+
+def test_split_csv_day_is_rejected(login):
+    client = login()
+    status, body = import_file(client, CSV_HEADER + (
+        "2023-01-01,Spinach,100,\n"
+        "2023-01-02,Oats,50,\n"
+        "2023-01-01,Oats,10,\n"
+    ))
+    assert status == 400
+    assert body == {"imported": 0, "error": "line 4: rows of 2023-01-01 must be consecutive"}
+    assert days(client) == []
+
+
+def test_repeated_ndjson_day_is_rejected(login):
+    client = login()
+    lines = [{"date": "2023-02-01", "items": [{"product": "Oats", "grams": 1}]}, {"date": "2023-02-01", "items": []}]
+    status, body = import_file(client, "".join(json.dumps(line) + "\n" for line in lines), "ndjson")
+    assert (status, body["error"]) == (400, "line 2: 2023-02-01 appears more than once")
+
+
+@pytest.mark.parametrize("row, error", [
+    ("2024-01-01,Spinach,nan,", "line 2: grams: grams must be a number, 0 or more"),
+    ("2024-01-01,Spinach,-500,", "line 2: grams: grams must be a number, 0 or more"),
+    ("2024-01-01,Spinach,lots,", "line 2: grams: grams must be a number, 0 or more"),
+    ("2024-01-01,Spinch,100,", "line 2: product: unknown food"),
+    ("2024-01-01,Old food,100,inf", "line 2: iron_mg: must be a number, 0 or more"),
+    ("2024-13-01,Spinach,100,", "line 2: month must be in 1..12"),
+])
+def test_bad_csv_row_is_a_400_with_its_line(login, row, error):
+    client = login()
+    status, body = import_file(client, CSV_HEADER + row + "\n")
+    assert (status, body) == (400, {"imported": 0, "error": error})
+
+
+@pytest.mark.parametrize("item, error", [
+    ({"product": "Oats", "grams": -1}, "line 1: grams: grams must be a number, 0 or more"),
+    ({"grams": 1}, "line 1: missing 'product'"),
+    ({"product": "", "grams": ""}, "line 1: product: enter a product"),
+])
+def test_bad_ndjson_item_is_a_400_with_its_line(login, item, error):
+    status, body = import_file(login(), json.dumps({"date": "2024-01-01", "items": [item]}) + "\n", "ndjson")
+    assert (status, body) == (400, {"imported": 0, "error": error})
+
+
+def test_batches_before_a_bad_line_stay_imported(login, monkeypatch):
+    monkeypatch.setattr(iron, "IMPORT_BATCH_DAYS", 2)
+    client = login()
+    status, body = import_file(client, CSV_HEADER + "".join(
+        f"2024-01-0{n},Oats,100,\n" for n in range(1, 6)
+    ) + "2024-01-06,Oats,-1,\n")
+    assert (status, body["imported"]) == (400, 4)
+    assert [day["date"] for day in days(client)] == [f"2024-01-0{n}" for n in range(1, 5)]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_export_import_round_trip(login, fmt):
+    source = login("alice")
+    source.put("/api/v1/days/2024-01-01", json={"items": [{"product": "Spinach", "grams": 120},
+                                                          {"product": "Tofu", "grams": 80.5}]})
+    source.put("/api/v1/days/2024-01-03", json={"items": [], "norm": 20})
+    source.put("/api/v1/days/2024-02-10", json={"items": [{"product": "Beef Liver", "grams": 33.3}]})
+    exported = source.get(f"/export.{fmt}").get_data(as_text=True)
+
+    target = login("bob")
+    target.put("/api/v1/days/2024-01-03", json={"items": [], "norm": 20})   # same norms as the source
+    status, body = import_file(target, exported, fmt)
+    assert (status, body) == (200, {"imported": 3})
+    assert days(target) == days(source)
@@ -0,0 +1,46 @@
+# tests/test_schema.py
+import sqlite3
+import threading
+
+import app as iron
+
+
+def test_migrations_run_once_when_started_together(tmp_path):
+    path = str(tmp_path / "iron.db")
+    errors = []
+    start = threading.Barrier(6)
+
+    def run():
+        db = sqlite3.connect(path, timeout=30)
+        start.wait()
+        try:
+            iron.migrate(db)
+        except Exception as e:
+            errors.append(e)
+        db.close()
+
+    threads = [threading.Thread(target=run) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    db = sqlite3.connect(path)
+    assert db.execute("PRAGMA user_version").fetchone()[0] == len(iron.MIGRATIONS)
+
+
+def test_backfill_moves_old_items(database):
+    with iron.write_db() as db:
+        db.execute("INSERT INTO records (user_id, record_date, total_iron, percentage, items_json) "
+                   "VALUES (1, '2020-01-01', 2.7, 18.0, '[{\"product\": \"Spinach\", \"grams\": 100, \"iron\": 2.7}]')")
+        plan = db.execute("EXPLAIN QUERY PLAN SELECT id FROM records WHERE items_json IS NOT NULL").fetchall()
+    assert "idx_records_items_json" in plan[0][3]
+    assert iron.backfill_record_items() == 1
+    assert iron.backfill_record_items() == 0
+    assert iron.SQLiteStorage().get_day(1, "2020-01-01").items == [{"product": "Spinach", "grams": 100, "iron": 2.7}]
+
+
+def test_sql_statements():
+    script = "CREATE TABLE t (\n  a TEXT  -- a; b\n);\nINSERT INTO t VALUES ('x;y');\n"
+    assert [s.strip() for s in iron.sql_statements(script)] == [
+        "CREATE TABLE t (\n  a TEXT  -- a; b\n);", "INSERT INTO t VALUES ('x;y');"]
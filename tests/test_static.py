@@ -0,0 +1,36 @@
+# tests/test_static.py
+import gzip
+import os
+
+import app as iron
+
+
+def get(path, **headers):
+    return iron.app.test_client().get(path, headers={"Accept-Encoding": "gzip", **headers})
+
+
+def test_current_hash_is_cached_forever():
+    version = iron.static_version("css/edit.css")
+    response = get(f"/static/css/edit.css?v={version}")
+    assert response.status_code == 200
+    assert response.cache_control.immutable and response.cache_control.max_age == iron.STATIC_MAX_AGE
+    with open(os.path.join(iron.app.static_folder, "css/edit.css"), "rb") as f:
+        assert gzip.decompress(response.data) == f.read()
+
+
+def test_other_versions_are_not_pinned_or_kept():
+    iron._compressed_static.clear()
+    for n in range(20):
+        response = get(f"/static/css/edit.css?v=old{n}")
+        assert response.status_code == 200
+        assert not response.cache_control.immutable
+        assert response.cache_control.max_age != iron.STATIC_MAX_AGE
+    assert iron._compressed_static == {}
+
+
+def test_one_compressed_copy_per_file_and_encoding():
+    iron._compressed_static.clear()
+    version = iron.static_version("css/edit.css")
+    first = get(f"/static/css/edit.css?v={version}").data
+    assert get(f"/static/css/edit.css?v={version}").data == first
+    assert list(iron._compressed_static) == [("css/edit.css", "gzip")]
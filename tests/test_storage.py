@@ -0,0 +1,100 @@
+# tests/test_storage.py
+"""Behaviour every storage backend shares, checked against each of them."""
+from datetime import date
+
+import pytest
+
+import app as iron
+from storage import Day, MemoryStorage, Storage
+
+USER = 1
+
+
+def item(product, grams, iron_mg):
+    return {"product": product, "grams": grams, "iron": iron_mg}
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def storage(request, database):
+    backend = iron.SQLiteStorage() if request.param == "sqlite" else MemoryStorage(iron.DEFAULT_NORM)
+    with iron.app.app_context():
+        yield backend
+
+
+def test_nothing_recorded(storage):
+    assert storage.get_day(USER, "2024-01-01") is None
+    assert storage.get_range(USER, "0001-01-01", "9999-12-31") == []
+    assert storage.version(USER) == (0, None)
+    assert storage.norm_on(USER, "2024-01-01") == iron.DEFAULT_NORM
+
+
+def test_put_and_get_day(storage):
+    items = [item("Spinach", 100.0, 2.7), item("Beef", 50.0, 1.35)]
+    total, percentage, changed = storage.put_day(USER, "2024-03-01", items, 15.0)
+    assert (total, percentage, changed) == (4.05, 27.0, ("2024-03-01", "2024-03-02"))
+    assert storage.get_day(USER, "2024-03-01") == Day("2024-03-01", 4.05, 27.0, items)
+    assert storage.get_day(USER, "2024-03-01", items=False).items is None
+
+
+def test_put_replaces_the_day(storage):
+    storage.put_day(USER, "2024-03-01", [item("Spinach", 100.0, 2.7), item("Beef", 50.0, 1.35)], 15.0)
+    storage.put_day(USER, "2024-03-01", [item("Oats", 10.0, 0.43)], 15.0)
+    day = storage.get_day(USER, "2024-03-01")
+    assert (day.total_iron, day.items) == (0.43, [item("Oats", 10.0, 0.43)])
+    assert len(storage.get_range(USER, "2024-03-01", "2024-03-01")) == 1
+
+
+def test_get_range_is_inclusive_and_sorted(storage):
+    for day in ("2024-01-05", "2024-01-03", "2024-01-01"):
+        storage.put_day(USER, day, [item("Tofu", 100.0, 5.4)], 15.0)
+    days = storage.get_range(USER, "2024-01-01", "2024-01-03")
+    assert [d.record_date for d in days] == ["2024-01-01", "2024-01-03"]
+    assert all(d.items is None for d in days)
+    with_items = storage.get_range(USER, "2024-01-02", "2024-01-09", items=True)
+    assert [d.record_date for d in with_items] == ["2024-01-03", "2024-01-05"]
+    assert with_items[0].items == [item("Tofu", 100.0, 5.4)]
+
+
+def test_norm_change_applies_until_the_next_one(storage):
+    for n in range(1, 6):
+        storage.put_day(USER, f"2024-01-0{n}", [item("Beef", 100.0, 3.0)], 15.0)
+    storage.put_day(USER, "2024-01-04", [item("Beef", 100.0, 3.0)], 10.0)
+    _, _, changed = storage.put_day(USER, "2024-01-02", [item("Beef", 100.0, 3.0)], 30.0)
+
+    assert changed == ("2024-01-02", "2024-01-04")
+    assert [d.percentage for d in storage.get_range(USER, "2024-01-01", "2024-01-05")] == [20.0, 10.0, 10.0, 30.0, 30.0]
+    assert [storage.norm_on(USER, f"2024-01-0{n}") for n in (1, 3, 4, 9)] == [15.0, 30.0, 10.0, 10.0]
+    # the last change runs to the end of the history
+    assert storage.put_day(USER, "2024-01-05", [], 12.0)[2] == ("2024-01-05", None)
+
+
+def test_recent_is_newest_first_with_gaps(storage):
+    storage.put_day(USER, "2024-01-01", [item("Oats", 100.0, 4.3)], 15.0)
+    storage.put_day(USER, "2024-01-03", [], 15.0)
+    window = storage.recent(USER, date(2024, 1, 3), 4)
+    assert [day for day, _ in window] == [date(2024, 1, 3), date(2024, 1, 2), date(2024, 1, 1), date(2023, 12, 31)]
+    assert [record and record.total_iron for _, record in window] == [0.0, None, 4.3, None]
+
+
+def test_version_moves_once_per_save(storage):
+    storage.put_days(USER, [("2024-01-01", [], 15.0), ("2024-01-02", [], 15.0)])
+    version, updated_at = storage.version(USER)
+    assert version == 1 and updated_at is not None
+    storage.put_day(USER, "2024-01-01", [], 15.0)
+    assert storage.version(USER)[0] == 2
+
+
+def test_users_are_separate(storage):
+    storage.put_day(USER, "2024-01-01", [item("Oats", 100.0, 4.3)], 20.0)
+    assert storage.get_day(USER + 1, "2024-01-01") is None
+    assert storage.norm_on(USER + 1, "2024-01-01") == iron.DEFAULT_NORM
+    assert storage.version(USER + 1) == (0, None)
+
+
+def test_incomplete_backend_fails_when_created():
+    class Partial(Storage):
+        def get_day(self, user_id, record_date, items=True):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,12 @@
+# tests/test_trends.py
+import pytest
+
+
+@pytest.mark.parametrize("period, first_bucket", [("week", "2024-01-29"), ("month", "2024-01-01")])
+def test_bucket_overlapping_the_start_is_included(login, period, first_bucket):
+    client = login()
+    for day in ("2024-01-30", "2024-02-01", "2024-02-05"):
+        client.put(f"/api/v1/days/{day}", json={"items": [{"product": "Spinach", "grams": 100}]})
+    body = client.get(f"/api/v1/trends/{period}?from=2024-01-31&to=2024-02-29").get_json()
+    assert body["points"][0]["start"] == first_bucket
+    assert sum(point["days"] for point in body["points"]) == 3